@@ -0,0 +1,194 @@
+import argparse
+import base64
+import json
+import os
+import resource
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+# Load test: drives N simulated sessions through the Reader and Explorer flows with Streamlit's AppTest,
+# against fake backends (CPU stand-in images, canned GPT answers with a configurable delay) and a
+# synthetic deck in a temporary library. Reports per-step latency percentiles and per-session memory.
+#
+#   python load_test.py --sessions 20 --concurrency 10 --gpt-delay 0.2
+
+ROOT = Path(__file__).parent
+READER_PAGE = str(ROOT / "pages" / "2_🧙_Tarot_GPT_Reader.py")
+EXPLORER_PAGE = str(ROOT / "pages" / "3_🔎_Deck_Explorer.py")
+
+
+class FakeOpenAIClient:
+    # Minimal stand-in for openai.Client covering the calls made through tarotGPT.clients
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+        create = SimpleNamespace(create=self._create, parse=self._create)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(with_raw_response=create))
+        self.beta = SimpleNamespace(chat=self.chat)
+
+    def _create(self, messages, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        completion = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="The cards counsel patience.", parsed=None))],
+            usage=SimpleNamespace(total_tokens=sum(len(message["content"]) for message in messages) // 4 + 50),
+        )
+        return SimpleNamespace(headers={}, parse=lambda: completion)
+
+
+# A complete 78-card deck with stand-in images
+def synthetic_deck():
+    from tarotGPT.deck_index import RANKS
+    from tarotGPT.imaging import standin_inference
+    from tarotGPT.models import ImagedArcana, ImagedTarotDeck
+    from tarotGPT.renditions import make_renditions
+
+    def card(name):
+        image = standin_inference(f"load test {name}", tier="preview")
+        return ImagedArcana(
+            name=name,
+            description=f"{name} description",
+            divinatory_meaning=f"{name} meaning",
+            reversed=f"{name} reversed",
+            physical_description=f"{name} physical description",
+            image_base64=base64.b64encode(image).decode("utf-8"),
+            renditions=make_renditions(image),
+        )
+
+    major = [card(f"Major {number}") for number in range(22)]
+    minor = [card(f"{rank} of {suit}") for suit in ("Wands", "Cups", "Swords", "Pentacles") for rank in RANKS]
+    return ImagedTarotDeck(major_arcana=major, minor_arcana=minor)
+
+
+def _button(app, label):
+    return next(button for button in app.button if button.label == label)
+
+
+def reader_session(app):
+    app.run()
+    yield "load"
+    next(text for text in app.text_input if text.label == "Enter your question:").input("Will the load test pass?")
+    _button(app, "Shuffle and Draw Cards").click()
+    app.run()
+    yield "reading"
+    app.run()
+    yield "replay"
+
+
+def explorer_session(app):
+    app.run()
+    yield "load"
+    _button(app, "Generate Major Arcana Grid PNG").click()
+    app.run()
+    yield "major_grid"
+    _button(app, "Generate Tarot Cards PDF").click()
+    app.run()
+    yield "pdf"
+
+
+def run_session(flow, page, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(page, default_timeout=timeout)
+    latencies = {}
+    started = time.perf_counter()
+    for step in flow(app):
+        if app.exception:
+            raise RuntimeError(f"{flow.__name__} step {step}: {app.exception[0].message}")
+        latencies[step] = time.perf_counter() - started
+        started = time.perf_counter()
+    memory = app.session_state["session_memory"] if "session_memory" in app.session_state else {}
+    return latencies, memory
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(results):
+    summary = {}
+    for flow_name, sessions in results.items():
+        steps = {}
+        for latencies, _ in sessions:
+            for step, seconds in latencies.items():
+                steps.setdefault(step, []).append(seconds)
+        resident = [memory.get("resident_bytes", 0) for _, memory in sessions]
+        spilled = [memory.get("spilled_bytes", 0) for _, memory in sessions]
+        summary[flow_name] = {
+            "sessions": len(sessions),
+            "latency_seconds": {
+                step: {f"p{int(q * 100)}": round(percentile(values, q), 3) for q in (0.5, 0.95, 0.99)}
+                for step, values in steps.items()
+            },
+            "session_state_bytes": {
+                "mean": int(sum(resident) / len(resident)) if resident else 0,
+                "max": max(resident, default=0),
+                "spilled_mean": int(sum(spilled) / len(spilled)) if spilled else 0,
+            },
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test of the Reader and Explorer pages")
+    parser.add_argument("--sessions", type=int, default=10, help="simulated sessions per flow")
+    parser.add_argument("--concurrency", type=int, default=10, help="sessions running at the same time")
+    parser.add_argument("--gpt-delay", type=float, default=0.1, help="seconds per fake GPT call")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds per script run")
+    parser.add_argument("--flows", nargs="+", default=["reader", "explorer"], choices=["reader", "explorer"])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="tarotgpt_load_test_")
+    os.environ["TAROTGPT_IMAGE_BACKEND"] = "standin"
+    os.environ["TAROTGPT_LIBRARY_DIR"] = os.path.join(workdir, "deck_library")
+    os.environ["TAROTGPT_READINGS_DIR"] = os.path.join(workdir, "readings")
+    os.chdir(workdir)
+
+    from tarotGPT import clients
+    from tarotGPT.library import get_library
+
+    fake_client = FakeOpenAIClient(args.gpt_delay)
+    clients._openai_client = fake_client
+    get_library().add_deck(synthetic_deck(), name="Load test deck", theme="load test")
+
+    flows = {"reader": (reader_session, READER_PAGE), "explorer": (explorer_session, EXPLORER_PAGE)}
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    results = {}
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = {
+            name: [executor.submit(run_session, *flows[name], args.timeout) for _ in range(args.sessions)]
+            for name in args.flows
+        }
+        for name, flow_futures in futures.items():
+            results[name] = [future.result() for future in flow_futures]
+    elapsed = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    total_sessions = args.sessions * len(args.flows)
+    report = {
+        "sessions": total_sessions,
+        "concurrency": args.concurrency,
+        "wall_seconds": round(elapsed, 2),
+        "gpt_calls": fake_client.calls,
+        "peak_rss_growth_kb_per_session": round((rss_after - rss_before) / total_sessions, 1),
+        "flows": summarize(results),
+        "client_stats": clients.client_stats(),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import modal
+from modal_tarot_flux import Model, app as tarot_lora_app
+from tarotGPT.batch import generate_decks
+from tarotGPT.image_backends import ImageRouter, ModalBackend, set_image_router
+
+# Headless batch deck generation on a Flux Model started for this run:
+#
+#   modal run modal_batch_decks.py --themes "Oceanic Adventures;Space Exploration" --concurrency 8
+#
+# The deck text and physical descriptions are generated locally with OPENAI_API_KEY.
+
+app = modal.App("tarot-batch-decks")
+app.include(tarot_lora_app)
+
+
+@app.local_entrypoint()
+def main(themes: str, output_dir: str = "decks", concurrency: int = 8, save_to_library: bool = False):
+    set_image_router(ImageRouter([ModalBackend(cls=Model)]))
+    results = generate_decks(
+        [theme.strip() for theme in themes.split(";") if theme.strip()],
+        output_dir=output_dir,
+        concurrency=concurrency,
+        save_to_library=save_to_library,
+    )
+    for theme, path in results.items():
+        print(f"{theme}: {path or 'failed, run again to resume'}")
@@ -7,7 +7,14 @@ import modal
 
 image = modal.Image.debian_slim(python_version="3.11").pip_install(
     "streamlit", "openai", "modal", "img2pdf"
-)
+).env({
+    "TAROTGPT_READINGS_DIR": "/data/readings",
+    "TAROTGPT_LIBRARY_DIR": "/data/deck_library",
+    "TAROTGPT_ARTIFACT_DIR": "/data/artifacts",
+})
+
+# Persistent storage for reading snapshots, the deck library and exported artifacts, shared across frontend container restarts
+data_volume = modal.Volume.from_name("tarot-gpt-data", create_if_missing=True)
 
 app = modal.App(name="tarot-gpt-streamlit-frontend", image=image)
 
@@ -29,12 +36,18 @@ streamlit_pages_folder_mount = modal.Mount.from_local_dir(
     remote_path="/root/pages"
 )
 
+tarotgpt_package_mount = modal.Mount.from_local_dir(
+    local_path=Path(__file__).parent / "tarotGPT",
+    remote_path="/root/tarotGPT"
+)
+
 @app.function(
     image=image,
     allow_concurrent_inputs=100,
     concurrency_limit=1,
-    mounts=[streamlit_script_mount, streamlit_pages_folder_mount],
+    mounts=[streamlit_script_mount, streamlit_pages_folder_mount, tarotgpt_package_mount],
     secrets=[modal.Secret.from_name("tarot-gpt-openai-key")],
+    volumes={"/data": data_volume},
     timeout=60*25,
     container_idle_timeout=60*20,
 )
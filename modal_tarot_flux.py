@@ -1,8 +1,14 @@
-import io
+import os
+import threading
 from pathlib import Path
-from pydantic import BaseModel
-from typing import List
+from typing import Optional
 import modal
+from tarotGPT.imaging import (
+    BASE_MODEL, DEFAULT_TIER, SEED, TAROT_LORA, PromptEmbeddingCache, StartupTimings, compile_enabled,
+    encode_flux_prompt, inference_key, load_card_pipeline, render_card, warm_up, warm_up_tiers,
+)
+from tarotGPT.singleflight import SingleFlight
+from tarotGPT.tracing import get_tracer, traced
 
 sdxl_image = (
     modal.Image.debian_slim(python_version="3.10")
@@ -18,16 +24,34 @@ sdxl_image = (
         "sentencepiece",
         "peft==0.11.1"
     )
+    # Optional compile and warm-up at container start, configured when deploying; spans go to stdout
+    # (the Modal logs) unless TAROTGPT_TRACE_JSONL is set to another target when deploying
+    .env({
+        "TAROTGPT_COMPILE": os.environ.get("TAROTGPT_COMPILE", "0"),
+        "TAROTGPT_WARM_UP_TIERS": os.environ.get("TAROTGPT_WARM_UP_TIERS", ""),
+        "TAROTGPT_TRACE_JSONL": os.environ.get("TAROTGPT_TRACE_JSONL", "-"),
+    })
 )
 
 app = modal.App("tarot-lora")
 
+tarotgpt_package_mount = modal.Mount.from_local_python_packages("tarotGPT")
+
 with sdxl_image.imports():
     import torch
     from diffusers import DiffusionPipeline
     from fastapi import Response
 
-@app.cls(gpu=modal.gpu.A100(), container_idle_timeout=240, image=sdxl_image, secrets=[modal.Secret.from_name("HF_TOKEN")], concurrency_limit=2)
+# Keep-warm policy, configured when deploying: TAROTGPT_KEEP_WARM containers are kept running at all times,
+# and idle containers shut down after TAROTGPT_IDLE_TIMEOUT seconds
+KEEP_WARM = int(os.environ.get("TAROTGPT_KEEP_WARM", 0))
+IDLE_TIMEOUT = int(os.environ.get("TAROTGPT_IDLE_TIMEOUT", 240))
+# Inputs a container accepts at once. The GPU runs one pipeline call at a time, so more than one only helps
+# when identical requests arrive together; otherwise the extra inputs queue behind the lock instead of
+# starting a second container
+CONCURRENT_INPUTS = int(os.environ.get("TAROTGPT_CONCURRENT_INPUTS", 1))
+
+@app.cls(gpu=modal.gpu.A100(), container_idle_timeout=IDLE_TIMEOUT, keep_warm=KEEP_WARM or None, image=sdxl_image, secrets=[modal.Secret.from_name("HF_TOKEN")], concurrency_limit=2, allow_concurrent_inputs=CONCURRENT_INPUTS, mounts=[tarotgpt_package_mount])
 class Model:
     @modal.build()
     def build(self):
@@ -40,72 +64,92 @@ class Model:
         ]
 
         snapshot_download(
-            "black-forest-labs/FLUX.1-dev", ignore_patterns=ignore
+            BASE_MODEL, ignore_patterns=ignore
         )
         snapshot_download(
-            "multimodalart/flux-tarot-v1", ignore_patterns=ignore
+            TAROT_LORA, ignore_patterns=ignore
         )
 
     @modal.enter()
+    @traced("Model.enter")
     def enter(self):
-        # Load base model
-        self.base = DiffusionPipeline.from_pretrained(
-            "black-forest-labs/FLUX.1-dev", torch_dtype=torch.bfloat16,
-        ).to("cuda")
+        # Load base model and LoRA, timing every phase of the container start
+        self.startup = StartupTimings()
+        self.base = load_card_pipeline(
+            DiffusionPipeline, "cuda", self.startup,
+            compile_fn=self._compile if compile_enabled() else None,
+            torch_dtype=torch.bfloat16,
+        )
 
-        self.base.load_lora_weights("multimodalart/flux-tarot-v1")
+        # With TAROTGPT_CONCURRENT_INPUTS > 1 identical requests can share one diffusion run,
+        # but the GPU only ever runs one pipeline call at a time
+        self.pipeline_lock = threading.Lock()
+        self.single_flight = SingleFlight("Model._inference")
 
-        # Compiling the model graph is JIT so this will increase inference time for the first run
-        # but speed up subsequent runs. Uncomment to enable.
-        # self.base.unet = torch.compile(self.base.unet, mode="reduce-overhead", fullgraph=True)
-        # self.refiner.unet = torch.compile(self.refiner.unet, mode="reduce-overhead", fullgraph=True)
+        # Text-encoder outputs are reused for repeated prompts, e.g. the preview and final render of a card
+        self.embedding_cache = PromptEmbeddingCache(
+            self._encode_prompt, max_entries=int(os.environ.get("TAROTGPT_EMBEDDING_CACHE_SIZE", 64))
+        )
 
-    def _inference(self, prompt, n_steps=24, high_noise_frac=0.8):
-        width = 768
-        height = 1024
-        seed = 0
-        lora_scale = 0.95
-        cfg_scale = 3.5
+        # Warm-up renders pay for kernel selection (and JIT compilation) before the first request arrives
+        warm_up(self._render, warm_up_tiers(), self.startup)
+        self.requests = 0
 
-        trigger_word = "in the style of TOK a trtcrd, tarot style"
+    # Compiling the model graph is JIT so this only wraps the transformer; the first render of each
+    # image size compiles it, which is why compilation should go together with the warm-up
+    def _compile(self, pipeline):
+        pipeline.transformer = torch.compile(pipeline.transformer, mode="max-autotune", fullgraph=True)
 
-        generator = torch.Generator(device="cuda").manual_seed(seed)
-    
-        image = self.base(
-            prompt=f"{prompt} {trigger_word}",
-            num_inference_steps=n_steps,
-            guidance_scale=cfg_scale,
-            width=width,
-            height=height,
-            generator=generator,
-            joint_attention_kwargs={"scale": lora_scale},
-        ).images[0]
+    def _encode_prompt(self, text):
+        with torch.inference_mode():
+            return encode_flux_prompt(self.base, text, device="cuda")
 
-        byte_stream = io.BytesIO()
-        image.save(byte_stream, format="JPEG")
+    def _render(self, prompt, n_steps, tier, seed=None):
+        with self.pipeline_lock:
+            generator = torch.Generator(device="cuda").manual_seed(SEED if seed is None else seed)
+            return render_card(
+                self.base, prompt, tier=tier, n_steps=n_steps, generator=generator, embedding_cache=self.embedding_cache
+            )
 
-        return byte_stream
+    # Identical in-flight requests (same prompt and render parameters) share a single diffusion run
+    @traced("Model._inference")
+    def _inference(self, prompt, n_steps=None, high_noise_frac=0.8, tier=DEFAULT_TIER, seed=None):
+        self.requests += 1
+        return self.single_flight.do(inference_key(prompt, tier, n_steps, seed), self._render, prompt, n_steps, tier, seed)
+
+    @modal.method()
+    def stats(self):
+        return {
+            "startup": self.startup.as_dict(),
+            "requests": self.requests,
+            "compiled": compile_enabled(),
+            "embedding_cache": self.embedding_cache.stats(),
+            "single_flight": self.single_flight.stats(),
+            # Per span name, e.g. render_card.pipeline against render_card.jpeg_encode
+            "spans": get_tracer().span_stats.as_dict(),
+        }
 
     @modal.method()
-    def inference(self, prompt, n_steps=24, high_noise_frac=0.8):
+    def inference(self, prompt, n_steps=None, high_noise_frac=0.8, tier=DEFAULT_TIER, seed=None):
         return self._inference(
-            prompt, n_steps=n_steps, high_noise_frac=high_noise_frac
+            prompt, n_steps=n_steps, high_noise_frac=high_noise_frac, tier=tier, seed=seed
         ).getvalue()
 
     @modal.web_endpoint(docs=True)
     def web_inference(
-        self, prompt: str, n_steps: int = 24, high_noise_frac: float = 0.8
+        self, prompt: str, n_steps: Optional[int] = None, high_noise_frac: float = 0.8, tier: str = DEFAULT_TIER,
+        seed: Optional[int] = None,
     ):
         return Response(
             content=self._inference(
-                prompt, n_steps=n_steps, high_noise_frac=high_noise_frac
+                prompt, n_steps=n_steps, high_noise_frac=high_noise_frac, tier=tier, seed=seed
             ).getvalue(),
             media_type="image/jpeg",
         )
     
 @app.local_entrypoint()
-def main(prompt: str = "The personification of middle managment saying middle management on the card"):
-    image_bytes = Model().inference.remote(prompt)
+def main(prompt: str = "The personification of middle managment saying middle management on the card", tier: str = DEFAULT_TIER):
+    image_bytes = Model().inference.remote(prompt, tier=tier)
 
     dir = Path("/tmp/flux-lora-v1")
     if not dir.exists():
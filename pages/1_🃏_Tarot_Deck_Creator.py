@@ -1,10 +1,28 @@
 import streamlit as st
-import openai
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List
+from tarotGPT.startup_profile import page_profile
+
+startup = page_profile("Tarot Deck Creator")
+
 import base64
+import random
 import uuid
-import modal
+from tarotGPT.models import Arcana, ImagedArcana, ImagedTarotDeck
+from tarotGPT.renditions import RENDITIONS, card_image_bytes
+from tarotGPT.gallery import render_card_gallery
+from tarotGPT.library import DuplicateDeckError, get_library
+from tarotGPT.scheduler import Priority
+from tarotGPT.clients import get_openai_client
+from tarotGPT.generation import (
+    description_batches, generate_card_image, generate_card_images, generate_deck, generate_physical_description
+)
+from tarotGPT.debug_panel import init_session_tracing, render_trace_panel
+from tarotGPT.session_memory import account_session_state, session_value
+from tarotGPT.image_delivery import begin_image_accounting, show_image
+
+startup.imports_done()
+
+init_session_tracing()
+begin_image_accounting()
 
 if 'theme' not in st.session_state:
     st.session_state["theme"] = ""
@@ -16,66 +34,182 @@ if 'deck' not in st.session_state:
 if 'custom_arcana_list' not in st.session_state:
     st.session_state.custom_arcana_list = []
 
-# Define Pydantic models for Tarot Deck
-class Arcana(BaseModel):
-    name: str = Field(..., description="The name of the tarot arcana")
-    description: str = Field(..., description="The description of the tarot arcana")
-    divinatory_meaning: str = Field(..., description="The divinatory meaning of the tarot arcana")
-    reversed: str = Field(..., description="The reversed divinatory meaning of the tarot arcana")
-
-class TarotDeck(BaseModel): 
-    major_arcana: List[Arcana] = Field(..., description="The 22 Major Arcana of a Tarot Deck")
-    minor_arcana: List[Arcana] = Field(..., description="The 56 Minor Arcana of a Tarot Deck")
-
-class ImagedArcana(Arcana):
-    physical_description: str = Field(..., description="The physical description of the tarot card")
-    image_base64: str = Field(..., description="The base64 encoded image of the tarot card")
-
-class ImagedTarotDeck(BaseModel):
-    major_arcana: List[ImagedArcana] = Field(..., description="The 22 Major Arcana of a Tarot Deck")
-    minor_arcana: List[ImagedArcana] = Field(..., description="The 56 Minor Arcana of a Tarot Deck")
-
-# Helper function to display the image from base64
-def display_image(image_base64, width=300):
-    image_data = base64.b64decode(image_base64)
-    st.image(image_data, width=width)
-
-# Function to call GPT-4 and generate card descriptions and images
-def generate_card(client: openai.Client, arcana: Arcana):
-    completion = client.chat.completions.create(
-        model="gpt-4o-2024-08-06",
-        messages=[
-            {"role": "system", "content": "Generate a short description of the physical tarot card that exemplifies the given arcana. Not more than 50 words."},
-            {"role": "user", "content": f"Arcana Name: {arcana.name} Description: {arcana.description}, Divinatory Meaning: {arcana.divinatory_meaning}, Reversed: {arcana.reversed}"},
-        ],
-        max_tokens=50,
-    )
-    description = completion.choices[0].message.content
-    description = description + f" The card says {arcana.name} on the card."
-
-    cls = modal.Cls.lookup("tarotGPT", "Model")
-    obj = cls()  # You can pass any constructor arguments here
-    response = obj.inference.remote(prompt=description)
-
-    image_base64 = base64.b64encode(response).decode("utf-8")
-
-    return description, image_base64
-
-def generate_deck(client: openai.Client, theme: str):
-    # Store the deck in session state to persist across reruns
-    completion = client.beta.chat.completions.parse(
-        model="gpt-4o-2024-08-06",
-        messages=[
-            {"role": "system", "content": "Generate a custom tarot deck based on the theme provided. Remember to include 22 major and 56 minor arcana. The minor arcana should follow four custom suits. Each suit should have an Ace, the Two, the Three, the Four, the Five, the Six, the Seven, the Eight, the Nine, the Ten, the Page, the Knight, the Queen, and the King of the suit."},
-            {"role": "user", "content": f"Theme: {theme}"},
-        ],
-        response_format=TarotDeck
+# Patch one edited card into the session deck and its library entry, so only that card's artifacts change
+def replace_custom_card(card_id: int, card: ImagedArcana, theme: str):
+    custom_deck = session_value("custom_deck")
+    cards = custom_deck.major_arcana + custom_deck.minor_arcana
+    cards[card_id] = card
+    num_major = len(custom_deck.major_arcana)
+    custom_deck = ImagedTarotDeck(major_arcana=cards[:num_major], minor_arcana=cards[num_major:])
+    st.session_state["custom_deck"] = custom_deck
+
+    deck_id = st.session_state.get("custom_deck_id")
+    if deck_id is not None and get_library().get_deck_info(deck_id) is not None:
+        try:
+            get_library().replace_card(deck_id, card_id, card)
+        except DuplicateDeckError as error:
+            # The edited deck is already in the library, use that deck from now on
+            st.session_state["custom_deck_id"] = error.deck_id
+            st.toast("The edited deck is identical to a deck already in the library; using that deck.")
+    else:
+        st.session_state["custom_deck_id"] = get_library().add_deck(custom_deck, name=theme, theme=theme)
+
+
+# Edit the text of a single card and regenerate its description and/or image, one inference per fix
+def card_editor(custom_deck, theme: str):
+    cards = custom_deck.major_arcana + custom_deck.minor_arcana
+    card_id = st.selectbox("Card to edit", range(len(cards)), format_func=lambda idx: cards[idx].name, key="edit_card_id")
+    card = cards[card_id]
+
+    col1, col2 = st.columns([1, 2])
+    show_image(card_image_bytes(card, *RENDITIONS["preview"]), caption=card.name, container=col1)
+    with col2.form(key=f"edit_card_{card_id}"):
+        description = st.text_area("Description", value=card.description)
+        divinatory_meaning = st.text_area("Divinatory Meaning", value=card.divinatory_meaning)
+        reversed_meaning = st.text_area("Reversed Meaning", value=card.reversed)
+        physical_description = st.text_area("Physical Card Description", value=card.physical_description)
+        save = st.form_submit_button("Save text")
+        regenerate_image = st.form_submit_button("Save and regenerate image")
+        regenerate_all = st.form_submit_button("Regenerate physical description and image")
+
+    if not (save or regenerate_image or regenerate_all):
+        return
+
+    image_base64, renditions = card.image_base64, card.renditions
+    if regenerate_all:
+        with st.spinner(f"Describing {card.name}..."):
+            arcana = Arcana(
+                name=card.name,
+                description=description,
+                divinatory_meaning=divinatory_meaning,
+                reversed=reversed_meaning,
+            )
+            physical_description = generate_physical_description(get_openai_client(), arcana, priority=Priority.INTERACTIVE)
+    if regenerate_image or regenerate_all:
+        # A fresh seed, so the same description still renders a different image
+        with st.spinner(f"Rendering {card.name}..."):
+            image_base64, renditions = generate_card_image(
+                physical_description, tier="final", priority=Priority.INTERACTIVE, seed=random.randrange(2 ** 31)
+            )
+
+    replace_custom_card(card_id, ImagedArcana(
+        name=card.name,
+        description=description,
+        divinatory_meaning=divinatory_meaning,
+        reversed=reversed_meaning,
+        physical_description=physical_description,
+        image_base64=image_base64,
+        renditions=renditions,
+    ), theme)
+    st.rerun()
+
+
+# Generate the physical descriptions and images of the given cards into custom_arcana_list. A card whose
+# final render fails keeps its preview; a card without any image stays None, to be retried. The deck is
+# built and saved once every card has an image.
+def generate_deck_images(deck, card_ids, batch_descriptions: bool, theme: str):
+    client = get_openai_client()
+    arcana_list = deck.major_arcana + deck.minor_arcana
+    card_ids = list(card_ids)
+
+    # Prepare progress bar and text
+    total_cards = len(card_ids)
+    progress_bar = st.progress(0)
+    progress_text = st.empty()
+
+    # One placeholder per card, filled with the preview first and replaced in place by the final render
+    card_columns = st.columns(6)
+    card_placeholders = {idx: card_columns[position % 6].empty() for position, idx in enumerate(card_ids)}
+
+    descriptions = {}
+    previews = {}
+    preview_only = []
+
+    # Physical descriptions come in one call per suit (and one for the major arcana) when batched,
+    # and a batch's previews start as soon as it lands. Final renders follow once every preview is shown.
+    if batch_descriptions:
+        batches = [[idx for idx in batch if idx in card_placeholders] for batch in description_batches(arcana_list, len(deck.major_arcana))]
+    else:
+        batches = [[idx] for idx in card_ids]
+
+    previews_done = 0
+    finals_done = 0
+    for stage, idx, result, error in generate_card_images(client, arcana_list, batches):
+        arcana = arcana_list[idx]
+        if stage == "description":
+            if error is not None:
+                card_placeholders[idx].warning(f"{arcana.name}: description failed ({error})")
+                previews_done += 1
+            else:
+                descriptions[idx] = result
+            continue
+
+        if stage == "preview":
+            # Update progress bar and progress text
+            previews_done += 1
+            progress_bar.progress(previews_done / total_cards)
+            progress_text.text(f"Generated preview {previews_done} of {total_cards}")
+            if error is not None:
+                card_placeholders[idx].warning(f"{arcana.name}: preview failed ({error})")
+            else:
+                previews[idx] = result[0]
+                show_image(base64.b64decode(previews[idx]), caption=f"{arcana.name} (preview)", container=card_placeholders[idx])
+            continue
+
+        # Replace each preview with its final render as soon as it lands
+        finals_done += 1
+        progress_bar.progress(finals_done / total_cards)
+        progress_text.text(f"Rendered final card {finals_done} of {total_cards}")
+        if error is None:
+            img_base64, renditions = result
+        elif idx in previews:
+            # Keep the preview; the card editor can render the final image later
+            img_base64, renditions = previews[idx], {}
+            preview_only.append(arcana.name)
+        else:
+            card_placeholders[idx].warning(f"{arcana.name}: image failed ({error})")
+            continue
+
+        # Create custom arcana with image and description
+        custom_arcana = ImagedArcana(
+            name=arcana.name,
+            description=arcana.description,
+            divinatory_meaning=arcana.divinatory_meaning,
+            reversed=arcana.reversed,
+            physical_description=descriptions[idx],
+            image_base64=img_base64,
+            renditions=renditions
+        )
+        st.session_state.custom_arcana_list[idx] = custom_arcana
+
+        # Display the generated card in place of its preview
+        show_image(card_image_bytes(custom_arcana, *RENDITIONS["thumbnail"]), caption=f"{arcana.name}", container=card_placeholders[idx])
+
+    if preview_only:
+        st.warning(f"Final renders failed for {', '.join(preview_only)}; their previews were kept. Regenerate them under Edit a Card.")
+    if any(card is None for card in st.session_state.custom_arcana_list):
+        return
+
+    # Create a new custom tarot deck
+    num_major = len(deck.major_arcana)
+    custom_deck = ImagedTarotDeck(
+        major_arcana=st.session_state.custom_arcana_list[:num_major],
+        minor_arcana=st.session_state.custom_arcana_list[num_major:]
     )
-    return completion.choices[0].message.parsed
+
+    st.session_state["custom_deck"] = custom_deck
+    # The list holds the same card objects as the deck; keeping it would pin them in memory
+    # even when the deck is spilled to disk
+    st.session_state.custom_arcana_list = []
+
+    # Keep the deck in the local library so the Reader and Explorer can load it by ID
+    deck_id = get_library().add_deck(custom_deck, name=theme, theme=theme)
+    st.session_state["custom_deck_id"] = deck_id
+    st.success(f"Deck generation completed! Saved to the deck library as {deck_id}.")
+
 
 # Streamlit app
 def tarot_app():
-    client = openai.Client()
     
     st.title("Custom Tarot Deck Generator")
 
@@ -100,10 +234,12 @@ def tarot_app():
         ### Step 3: Generate Tarot Card Images
         - **Button**: After reviewing your deck, click the **Generate Deck Card Images** button.
         - **Progress Bar**: A progress bar will appear, indicating the status of generating each card's physical description and image.
-        - **Live Rendering**: As each card is generated, the image and description will be displayed in real-time below the progress bar.
+        - **Batched Descriptions**: With *Batch physical descriptions per suit* checked, the physical descriptions are generated with one request per suit and one for the Major Arcana, and each batch's cards start rendering as soon as it arrives.
+        - **Live Rendering**: As each card is generated, a fast low-resolution preview is displayed in real-time below the progress bar. Once every preview is shown, full-quality renders follow and replace the previews in place.
+        - **Failures**: A card whose final render fails keeps its preview image. Cards that could not be generated at all are listed, and the **Retry Failed Cards** button generates only those.
 
         ### Step 4: Review the Generated Cards
-        - **Major Arcana**: The generated Major Arcana cards will be shown first. You can expand each card to view its:
+        - **Major Arcana**: The generated Major Arcana cards will be shown first as a paginated gallery of thumbnails. You can open each card to view its:
         - Name
         - Description
         - Divinatory Meaning
@@ -113,7 +249,14 @@ def tarot_app():
         
         - **Minor Arcana**: The generated Minor Arcana cards will be shown next with the same details and image rendering.
 
-        ### Step 5: Download the Custom Deck
+        ### Step 5: Fix Individual Cards
+        - **Edit a Card**: Below the galleries, pick a card to edit its texts and physical description.
+        - **Save text**: Keeps the card's image and only updates its texts.
+        - **Save and regenerate image**: Renders a new image from the (edited) physical description, one image generation instead of the whole deck.
+        - **Regenerate physical description and image**: Writes a new physical description for the card, then renders it.
+        - The card is patched into the saved deck in the library, so the Reader and Explorer pick up the change and only the PDF pages showing that card are rendered again.
+
+        ### Step 6: Download the Custom Deck
         - **Download**: Once all the cards are generated, you can download the entire deck as a JSON file.
         - **Button**: Click the **Download Deck JSON** button to save the JSON file to your computer.
         
@@ -143,8 +286,11 @@ def tarot_app():
     if st.button("Generate Deck"):
         if len(theme_prompt) > 0:
             with st.spinner("Generating your custom Tarot deck..."):
-                deck = generate_deck(client, theme_prompt)
+                deck = generate_deck(get_openai_client(), theme_prompt)
                 st.session_state.deck = deck
+                st.session_state["custom_deck"] = None
+                st.session_state["custom_deck_id"] = None
+                st.session_state.custom_arcana_list = []
 
     if st.session_state.deck is not None:
         deck = st.session_state.deck
@@ -165,67 +311,42 @@ def tarot_app():
                 st.markdown(f"**Divinatory Meaning**: {arcana.divinatory_meaning}")
                 st.markdown(f"**Reversed Meaning**: {arcana.reversed}")
 
+        batch_descriptions = st.checkbox(
+            "Batch physical descriptions per suit", value=True,
+            help="One GPT call per suit and one for the major arcana instead of one call per card",
+        )
         if st.button("Generate Deck Card Images"):
-            # Prepare progress bar and text
-            total_cards = len(deck.major_arcana) + len(deck.minor_arcana)
-            progress_bar = st.progress(0)
-            progress_text = st.empty()
-
-            # Generate deck card by card
-            for idx, arcana in enumerate(deck.major_arcana + deck.minor_arcana):
-                # Update progress bar and progress text
-                progress_percent = (idx + 1) / total_cards
-                progress_bar.progress(progress_percent)
-                progress_text.text(f"Generating card {idx + 1} of {total_cards}")
-
-                # Generate card description and image
-                description, img_base64 = generate_card(client, arcana)
-                
-                # Create custom arcana with image and description
-                custom_arcana = ImagedArcana(
-                    name=arcana.name,
-                    description=arcana.description,
-                    divinatory_meaning=arcana.divinatory_meaning,
-                    reversed=arcana.reversed,
-                    physical_description=description,
-                    image_base64=img_base64
-                )
-                st.session_state.custom_arcana_list.append(custom_arcana)
-
-                # Display the generated card
-                st.image(base64.b64decode(img_base64), caption=f"{arcana.name}")
-
-            # Create a new custom tarot deck
-            custom_deck = ImagedTarotDeck(
-                major_arcana=st.session_state.custom_arcana_list[:22],
-                minor_arcana=st.session_state.custom_arcana_list[22:]
-            )
-
-            # Major Arcana
+            st.session_state["custom_deck"] = None
+            st.session_state["custom_deck_id"] = None
+            st.session_state.custom_arcana_list = [None] * len(deck.major_arcana + deck.minor_arcana)
+            generate_deck_images(deck, range(len(st.session_state.custom_arcana_list)), batch_descriptions, theme_prompt)
+
+        # Cards whose generation failed are kept out of the deck until they are generated again
+        missing = [idx for idx, card in enumerate(st.session_state.custom_arcana_list) if card is None]
+        if missing and st.session_state.get("custom_deck") is None:
+            arcana_list = deck.major_arcana + deck.minor_arcana
+            error = st.empty()
+            error.error(f"{len(missing)} cards could not be generated: {', '.join(arcana_list[idx].name for idx in missing)}")
+            if st.button("Retry Failed Cards"):
+                error.empty()
+                generate_deck_images(deck, missing, batch_descriptions, theme_prompt)
+
+        custom_deck = session_value("custom_deck")
+        if custom_deck is not None:
+            # Paginated galleries only send the thumbnails of the visible page on every rerun
             st.title("Major Arcana")
-            for arcana in custom_deck.major_arcana:
-                with st.expander(arcana.name):
-                    st.markdown(f"**Description**: {arcana.description}")
-                    st.markdown(f"**Divinatory Meaning**: {arcana.divinatory_meaning}")
-                    st.markdown(f"**Reversed Meaning**: {arcana.reversed}")
-                    st.markdown(f"**Physical Card Description**: {arcana.physical_description}")
-                    display_image(arcana.image_base64)
-
-            # Minor Arcana
+            render_card_gallery(custom_deck.major_arcana, key="creator_major")
+
             st.title("Minor Arcana")
-            for arcana in custom_deck.minor_arcana:
-                with st.expander(arcana.name):
-                    st.markdown(f"**Description**: {arcana.description}")
-                    st.markdown(f"**Divinatory Meaning**: {arcana.divinatory_meaning}")
-                    st.markdown(f"**Reversed Meaning**: {arcana.reversed}")
-                    st.markdown(f"**Physical Card Description**: {arcana.physical_description}")
-                    display_image(arcana.image_base64)
+            render_card_gallery(custom_deck.minor_arcana, key="creator_minor")
+
+            st.title("Edit a Card")
+            card_editor(custom_deck, theme_prompt)
 
             # Convert the custom deck to JSON
             deck_json = custom_deck.json()
 
             # Provide download link for JSON deck file
-            st.success("Deck generation completed!")
             st.download_button(
                 label="Download Deck JSON",
                 data=deck_json,
@@ -235,3 +356,6 @@ def tarot_app():
 
 if __name__ == "__main__":
     tarot_app()
+    account_session_state(spillable=("custom_deck",))
+    render_trace_panel()
+    startup.rendered()
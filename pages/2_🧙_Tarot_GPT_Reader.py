@@ -1,37 +1,37 @@
 import streamlit as st
+from tarotGPT.startup_profile import page_profile, lazy_import
+
+startup = page_profile("Tarot GPT Reader")
+
 import random
 import json
-import openai
-from PIL import Image
 from io import BytesIO
 import base64
-from pydantic import BaseModel, Field, ValidationError
+from pydantic import ValidationError
 from typing import List
-from PIL import Image, ImageOps
-import requests
-import json
-
+from tarotGPT.models import ImagedArcana, ImagedTarotDeck
+from tarotGPT.renditions import RENDITIONS, card_image_bytes, card_pil_image, reversed_image_bytes
+from tarotGPT.image_delivery import begin_image_accounting, show_image
+from tarotGPT.tracing import span, traced
+from tarotGPT.clients import chat_completion, get_openai_client
+from tarotGPT.deck_index import DeckIndex
+from tarotGPT.deck_picker import pick_deck_source, offer_library_import
+from tarotGPT.library import get_library
+from tarotGPT.snapshots import ReadingSnapshot, SnapshotCard, SnapshotStore, new_reading_id
+from tarotGPT.debug_panel import init_session_tracing, render_trace_panel
+from tarotGPT.session_memory import account_session_state, session_value
 
-# Define Pydantic models
-class Arcana(BaseModel):
-    name: str = Field(..., description="The name of the tarot arcana")
-    description: str = Field(..., description="The description of the tarot arcana")
-    divinatory_meaning: str = Field(..., description="The divinatory meaning of the tarot arcana")
-    reversed: str = Field(..., description="The reversed divinatory meaning of the tarot arcana")
+startup.imports_done()
 
-class ImagedArcana(Arcana):
-    physical_description: str = Field(..., description="The physical description of the tarot card")
-    image_base64: str = Field(..., description="The base64 encoded image of the tarot card")
-
-class ImagedTarotDeck(BaseModel):
-    major_arcana: List[ImagedArcana] = Field(..., description="The 22 Major Arcana of a Tarot Deck")
-    minor_arcana: List[ImagedArcana] = Field(..., description="The 56 Minor Arcana of a Tarot Deck")
+init_session_tracing()
+begin_image_accounting()
 
 
 # Function to fetch the tarot deck from a Gist URL and parse it
 def fetch_tarot_deck_from_gist(gist_url):
     try:
         # Make a GET request to the Gist URL
+        requests = lazy_import("requests")
         response = requests.get(gist_url)
         
         # Check if the response is valid
@@ -56,6 +56,27 @@ def fetch_tarot_deck_from_gist(gist_url):
         st.error(f"Error fetching tarot deck: {str(e)}")
         return None
 
+# Load the deck and its index from the library (text only, images per card on demand) or from a Gist URL
+def load_reader_deck(library_deck_id, gist_url):
+    if library_deck_id:
+        library = get_library()
+        tarot_deck = library.load_deck(library_deck_id, with_images=False)
+        if tarot_deck is None:
+            st.error(f"Deck {library_deck_id} was not found in the library.")
+            return None, None
+        deck_index = DeckIndex(
+            tarot_deck,
+            content_hash=library.get_deck_info(library_deck_id)["content_hash"],
+            image_loader=lambda card_id: library.load_card(library_deck_id, card_id, renditions=RENDITIONS),
+        )
+        return tarot_deck, deck_index
+
+    tarot_deck = fetch_tarot_deck_from_gist(gist_url)
+    if tarot_deck is None:
+        return None, None
+    offer_library_import(tarot_deck, gist_url, key="reader")
+    return tarot_deck, DeckIndex(tarot_deck)
+
 # Load tarot deck from JSON and parse with Pydantic models
 def load_tarot_deck(file_path):
     with open(file_path, 'r') as file:
@@ -63,22 +84,18 @@ def load_tarot_deck(file_path):
     tarot_deck = ImagedTarotDeck(**data)
     return tarot_deck
 
-# Function to decode the base64 image and display it, rotated if reversed
+# Display the card's preview rendition as stored, or its cached upside-down variant if reversed
 def display_card_image(card: ImagedArcana, reversed: bool):
-    image_data = base64.b64decode(card.image_base64)
-    image = Image.open(BytesIO(image_data))
+    image_data = card_image_bytes(card, *RENDITIONS["preview"])
     if reversed:
-        image = image.rotate(180)
-    st.image(image, caption=card.name, use_column_width=True)
-
-# Shuffle the deck and draw cards (excluding already drawn cards), with 50:50 reversed logic
-def draw_cards(deck, num_cards, excluded_cards):
-    available_cards = [card for card in (deck.major_arcana + deck.minor_arcana) if card not in excluded_cards]
-    random.shuffle(available_cards)
-    drawn_cards = available_cards[:num_cards]
+        image_data = reversed_image_bytes(image_data)
+    show_image(image_data, caption=card.name)
+
+# Shuffle the deck and draw cards (excluding already drawn card IDs), with 50:50 reversed logic
+def draw_cards(deck_index: DeckIndex, num_cards, excluded_ids, rng=None):
+    drawn_cards = deck_index.draw(num_cards, excluded_ids, rng=rng)
     
-    # Assign roughly 50% of cards as reversed
-    card_states = [{'card': card, 'reversed': random.choice([True, False])} for card in drawn_cards]
+    card_states = [{'id': card_id, 'card': deck_index.imaged_card(card_id), 'reversed': reversed} for card_id, reversed in drawn_cards]
     
     return card_states
 
@@ -93,14 +110,16 @@ def generate_deck_description(tarot_deck):
     return deck_description
 
 # Call GPT-4 for card interpretation
+@traced("interpret_card")
 def interpret_card(card: ImagedArcana, querent_question: str, position: str, reversed: bool, deck_description: str):
     orientation = "reversed" if reversed else "upright"
     prompt = f"Interpret the tarot card {card.name} in relation to the querent's question: '{querent_question}'. The card is in the position: {position}, and it is {orientation}. Here is the divinatory meaning: {card.divinatory_meaning}. Reversed: {card.reversed}."
     
     system_prompt = f"{deck_description}\nYou are a tarot reader following the ancient Celtic method."
     
-    client = openai.Client()
-    response = client.chat.completions.create(
+    client = get_openai_client()
+    response = chat_completion(
+        client,
         model="gpt-4o-2024-08-06",
         messages=[
             {"role": "system", "content": system_prompt},
@@ -111,6 +130,7 @@ def interpret_card(card: ImagedArcana, querent_question: str, position: str, rev
     return response.choices[0].message.content.strip()
 
 # Generate a final summary using GPT-4
+@traced("generate_summary")
 def generate_summary(querent_question: str, interpretations: List[str], deck_description: str):
     summary_prompt = f"Given the following tarot card interpretations and the querent's question: '{querent_question}', create a cohesive summary that ties everything together in relation to the querent's question:\n\n"
     
@@ -121,8 +141,9 @@ def generate_summary(querent_question: str, interpretations: List[str], deck_des
     
     system_prompt = f"{deck_description}\nYou are a tarot reader following the ancient Celtic method."
     
-    client = openai.Client()
-    response = client.chat.completions.create(
+    client = get_openai_client()
+    response = chat_completion(
+        client,
         model="gpt-4o-2024-08-06",
         messages=[
             {"role": "system", "content": system_prompt},
@@ -132,16 +153,19 @@ def generate_summary(querent_question: str, interpretations: List[str], deck_des
     
     return response.choices[0].message.content.strip()
 
-# Function to decode the base64 image and convert to PIL image
-def get_card_image(card: ImagedArcana, reversed: bool):
-    image_data = base64.b64decode(card.image_base64)
-    image = Image.open(BytesIO(image_data))
+# Function to decode the smallest rendition covering `size` and convert to PIL image
+def get_card_image(card: ImagedArcana, reversed: bool, size=(120, 180)):
+    image = card_pil_image(card, *size)
     if reversed:
+        ImageOps = lazy_import("PIL.ImageOps")
         image = ImageOps.flip(ImageOps.mirror(image))
     return image
 
 # Function to draw the Keltic Cross spread
+@traced("draw_keltic_cross")
 def draw_keltic_cross(cards):
+    Image = lazy_import("PIL.Image")
+
     # Create a blank white canvas
     canvas = Image.new('RGB', (1000, 1000), (255, 255, 255))  # Increased size for spacing
     
@@ -164,10 +188,7 @@ def draw_keltic_cross(cards):
     
     # Draw each card in the Keltic Cross spread
     for idx, card_data in enumerate(cards):
-        card_image = get_card_image(card_data['card'], card_data['reversed'])
-        
-        # Resize card image
-        card_image = card_image.resize((120, 180))
+        card_image = get_card_image(card_data['card'], card_data['reversed'], size=(120, 180))
         
         # Special handling for Card 2 ("This Crosses")
         if idx == 1:
@@ -176,13 +197,37 @@ def draw_keltic_cross(cards):
         # Paste the card on the canvas
         canvas.paste(card_image, positions[idx + 1], card_image.convert('RGBA'))
     
-    # Convert the canvas to a format that can be rendered in Streamlit
-    buffered = BytesIO()
-    canvas.save(buffered, format="PNG")
-    img_data = buffered.getvalue()
+    # Encode the canvas once as JPEG, sent to the browser and stored in the snapshot as-is
+    with span("draw_keltic_cross.jpeg_encode"):
+        buffered = BytesIO()
+        canvas.save(buffered, format="JPEG", quality=90)
+        img_data = buffered.getvalue()
     
     return img_data
 
+# Render a stored reading without any LLM or image generation work
+def render_reading_snapshot(snapshot: ReadingSnapshot, deck_index: DeckIndex = None):
+    st.header("Keltic Cross Layout")
+    show_image(base64.b64decode(snapshot.spread_image_base64), caption="Keltic Cross Layout")
+
+    # Per-position images are only shown when the reading's deck is the one currently loaded
+    show_card_images = deck_index is not None and deck_index.content_hash == snapshot.deck_hash
+
+    for card in snapshot.cards:
+        st.subheader(f"Position {card.position}: {card.name} ({'Reversed' if card.reversed else 'Upright'})")
+        if show_card_images:
+            display_card_image(deck_index.imaged_card(card.card_id), card.reversed)
+        with st.expander(card.name):
+            st.write(f"**Description**: {card.description}")
+            st.write(f"**Divinatory Meaning**: {card.divinatory_meaning}")
+            st.write(f"**Reversed Meaning**: {card.reversed_meaning}")
+            st.write(f"**Physical Description**: {card.physical_description}")
+        st.write(card.interpretation)
+
+    st.subheader("Final Summary")
+    st.write(snapshot.summary)
+    st.caption(f"Reading ID: {snapshot.reading_id} (share this page with ?reading={snapshot.reading_id})")
+
 # Streamlit application
 def tarot_reading_app():
     st.title("Tarot GPT Reading with the Keltic Method")
@@ -197,6 +242,7 @@ def tarot_reading_app():
             ### Step 0: Fetch a Tarot Deck from Gist
             - **Upload your custom tarot deck to a Gist**: Create a JSON file containing 78 tarot cards with descriptions, meanings, and images. Upload the file to a Gist and enter the Gist URL in the provided text box.
             - **Fetch Deck**: The application will fetch the tarot deck from the Gist URL and display the cards for selection.
+            - **Deck Library**: Decks created in the Deck Creator or saved from a Gist are kept in the local deck library and can be selected by name instead.
 
             ### Step 1: Choose the Querent's Card
             - **Court Card Selection**: In this step, you select a card to represent the querent (the person receiving the reading). Typically, this will be a court card such as a **Page**, **Knight**, **Queen**, or **King**, which best represents the querent’s personality or physical characteristics.
@@ -245,19 +291,32 @@ def tarot_reading_app():
 
             ## Notes:
             - This application leverages GPT-4 to provide interpretations for each card in relation to the querent's question, creating a personalized reading experience.
-            - The tarot deck must be uploaded from a json that is downloaded from a github gist.
+            - The tarot deck is loaded from the local deck library or from a json that is downloaded from a github gist.
             - The Keltic Cross layout provides a detailed and structured tarot reading that considers various aspects of the querent's situation, including past influences, future possibilities, external factors, and internal fears.
 
             Enjoy your tarot reading experience!
 
             """)
         
-    # Step 0: Enter Gist URL
-    st.header("Step 0: Enter Gist URL for Tarot Deck JSON")
-    gist_url = st.text_input("Enter the Gist URL for the Tarot Deck JSON:")
-
-    if gist_url:
-        tarot_deck = fetch_tarot_deck_from_gist(gist_url)
+    snapshot_store = SnapshotStore()
+
+    # Shared reading links render straight from the stored snapshot
+    shared_reading_id = st.query_params.get("reading")
+    if shared_reading_id and shared_reading_id != st.session_state.get("reading_id"):
+        snapshot = snapshot_store.load(shared_reading_id)
+        if snapshot is not None:
+            st.header("Shared Reading")
+            st.write(f"**Question**: {snapshot.question}")
+            render_reading_snapshot(snapshot)
+            return
+        st.error(f"Reading {shared_reading_id} was not found.")
+
+    # Step 0: Choose the deck from the library or a Gist URL
+    st.header("Step 0: Choose a Tarot Deck from the Library or a Gist URL")
+    library_deck_id, gist_url = pick_deck_source("reader")
+
+    if library_deck_id or gist_url:
+        tarot_deck, deck_index = load_reader_deck(library_deck_id, gist_url)
         
         if tarot_deck:
             st.success("Tarot deck fetched successfully!")
@@ -271,15 +330,14 @@ def tarot_reading_app():
                 # Step 1: Querent's card selection
                 st.header("Step 1: Choose a card to represent the Querent")
                 
-                # Filter for Court Cards (assuming they're all in the Minor Arcana)
-                court_cards = [card for card in tarot_deck.minor_arcana if "Page" in card.name or "Knight" in card.name or "Queen" in card.name or "King" in card.name]
-                
-                querent_card_name = st.selectbox(
+                # Court Cards of the Minor Arcana are looked up once in the deck index
+                querent_card_id = st.selectbox(
                     "Select the card that best represents the Querent:",
-                    [card.name for card in court_cards]
+                    deck_index.court_ids,
+                    format_func=lambda card_id: deck_index.card(card_id).name,
                 )
                 
-                querent_card = next((card for card in court_cards if card.name == querent_card_name), None)
+                querent_card = deck_index.imaged_card(querent_card_id) if querent_card_id is not None else None
                 
                 if querent_card:
                     # Display the Querent card separately
@@ -292,11 +350,12 @@ def tarot_reading_app():
                 
                 # Button to start the reading
                 if st.button("Shuffle and Draw Cards"):
-                    # Initialize excluded cards list with the Querent's card
-                    excluded_cards = [querent_card]
+                    # Initialize excluded card IDs with the Querent's card
+                    excluded_ids = [querent_card_id] if querent_card_id is not None else []
                     
-                    # Draw 10 cards for Keltic Spread (excluding the Querent's card)
-                    drawn_cards = draw_cards(tarot_deck, 10, excluded_cards)
+                    # Draw 10 cards for Keltic Spread (excluding the Querent's card) from a seeded shuffle
+                    seed = random.SystemRandom().randrange(2**32)
+                    drawn_cards = draw_cards(deck_index, 10, excluded_ids, rng=random.Random(seed))
                     
                     # The first card is for "This Covers", the second is for "This Crosses"
                     covers_card = drawn_cards.pop(0)
@@ -307,7 +366,7 @@ def tarot_reading_app():
                     
                     # Pass the first two cards separately and then the rest
                     keltic_cross_image = draw_keltic_cross([covers_card, crosses_card] + drawn_cards)
-                    st.image(keltic_cross_image, caption="Keltic Cross Layout", use_column_width=True)
+                    show_image(keltic_cross_image, caption="Keltic Cross Layout")
 
                     # Positions for Keltic Spread
                     positions = ["This Covers", "This Crosses", "This Is Beneath", "This Is Behind", 
@@ -336,9 +395,49 @@ def tarot_reading_app():
                     st.subheader("Final Summary")
                     summary = generate_summary(querent_question, interpretations, deck_description)
                     st.write(summary)
+
+                    # Persist the reading so reruns and shared links replay it instead of drawing again
+                    snapshot = ReadingSnapshot(
+                        reading_id=new_reading_id(),
+                        deck_hash=deck_index.content_hash,
+                        deck_source=gist_url or f"library:{library_deck_id}",
+                        seed=seed,
+                        querent_card_id=querent_card_id,
+                        question=querent_question,
+                        cards=[
+                            SnapshotCard(
+                                card_id=card_data['id'],
+                                name=card_data['card'].name,
+                                reversed=card_data['reversed'],
+                                position=positions[idx],
+                                description=card_data['card'].description,
+                                divinatory_meaning=card_data['card'].divinatory_meaning,
+                                reversed_meaning=card_data['card'].reversed,
+                                physical_description=card_data['card'].physical_description,
+                                interpretation=interpretations[idx],
+                            )
+                            for idx, card_data in enumerate([covers_card, crosses_card] + drawn_cards)
+                        ],
+                        spread_image_base64=base64.b64encode(keltic_cross_image).decode("utf-8"),
+                        summary=summary,
+                    )
+                    snapshot_store.save(snapshot)
+                    st.session_state["reading_id"] = snapshot.reading_id
+                    st.session_state["reading_snapshot"] = snapshot
+                    st.query_params["reading"] = snapshot.reading_id
+                    st.caption(f"Reading ID: {snapshot.reading_id} (share this page with ?reading={snapshot.reading_id})")
+
+                elif st.session_state.get("reading_snapshot") is not None:
+                    # Any other rerun replays the last reading of this session
+                    snapshot = session_value("reading_snapshot")
+                    if snapshot.deck_hash == deck_index.content_hash:
+                        render_reading_snapshot(snapshot, deck_index)
             except Exception as e:
                 st.error(f"Error loading tarot deck: {str(e)}")
 
 # Run the Streamlit app
 if __name__ == "__main__":
     tarot_reading_app()
+    account_session_state(spillable=("reading_snapshot",))
+    render_trace_panel()
+    startup.rendered()
@@ -1,36 +1,39 @@
 import streamlit as st
+from tarotGPT.startup_profile import page_profile, lazy_import
+
+startup = page_profile("Deck Explorer")
+
 import json
-from PIL import Image
 from io import BytesIO
-import base64
-from pydantic import BaseModel, Field, ValidationError
-from typing import List
-import requests
+import hashlib
+from pydantic import ValidationError
 import math
 import os
-import img2pdf
 import uuid
-import modal 
-
-# Define Pydantic models
-class Arcana(BaseModel):
-    name: str = Field(..., description="The name of the tarot arcana")
-    description: str = Field(..., description="The description of the tarot arcana")
-    divinatory_meaning: str = Field(..., description="The divinatory meaning of the tarot arcana")
-    reversed: str = Field(..., description="The reversed divinatory meaning of the tarot arcana")
-
-class ImagedArcana(Arcana):
-    physical_description: str = Field(..., description="The physical description of the tarot card")
-    image_base64: str = Field(..., description="The base64 encoded image of the tarot card")
-
-class ImagedTarotDeck(BaseModel):
-    major_arcana: List[ImagedArcana] = Field(..., description="The 22 Major Arcana of a Tarot Deck")
-    minor_arcana: List[ImagedArcana] = Field(..., description="The 56 Minor Arcana of a Tarot Deck")
+from tarotGPT.models import ImagedTarotDeck
+from tarotGPT.renditions import RENDITIONS, card_pil_image
+from tarotGPT.gallery import render_card_gallery
+from tarotGPT.deck_picker import pick_deck_source, offer_library_import
+from tarotGPT.library import get_library
+from tarotGPT.deck_index import card_content_hash, deck_content_hash
+from tarotGPT.artifacts import artifact_key, get_artifact_store
+from tarotGPT.tracing import span, traced
+from tarotGPT.scheduler import Priority
+from tarotGPT.clients import flux_inference
+from tarotGPT.debug_panel import init_session_tracing, render_trace_panel
+from tarotGPT.session_memory import account_session_state, session_value
+from tarotGPT.image_delivery import begin_image_accounting, show_image
+
+startup.imports_done()
+
+init_session_tracing()
+begin_image_accounting()
 
 # Function to fetch the tarot deck from a Gist URL and parse it
 def fetch_tarot_deck_from_gist(gist_url):
     try:
         # Make a GET request to the Gist URL
+        requests = lazy_import("requests")
         response = requests.get(gist_url)
         
         # Check if the response is valid
@@ -56,24 +59,17 @@ def fetch_tarot_deck_from_gist(gist_url):
         return None
     
 
-def generate_cardback(prompt: str) -> str:
-    cls = modal.Cls.lookup("tarotGPT", "Model")
-    obj = cls()  # You can pass any constructor arguments here
-    response = obj.inference.remote(prompt=prompt)
-
-    image_base64 = base64.b64encode(response).decode("utf-8")
+# Generate a cardback and return its encoded JPEG bytes, kept as-is for display and decoded only for the PDF
+def generate_cardback(prompt: str) -> bytes:
+    with span("generate_cardback.flux_inference"):
+        return flux_inference(prompt, priority=Priority.INTERACTIVE)
 
-    image_data = base64.b64decode(image_base64)
-    image = Image.open(BytesIO(image_data))
-    return image
 
-# Function to decode the base64 image and display it, rotated if reversed
-def display_card_image(card: ImagedArcana, reversed: bool):
-    image_data = base64.b64decode(card.image_base64)
-    image = Image.open(BytesIO(image_data))
-    if reversed:
-        image = image.rotate(180)
-    st.image(image, caption=card.name, use_column_width=True)
+def decode_image(image_bytes):
+    if image_bytes is None:
+        return None
+    Image = lazy_import("PIL.Image")
+    return Image.open(BytesIO(image_bytes))
 
 if "deck_pdf" not in st.session_state:
     st.session_state["deck_pdf"] = None
@@ -90,21 +86,82 @@ if "minor_arcana_images" not in st.session_state:
 if "deck_pdf_path" not in st.session_state:
     st.session_state["deck_pdf_path"] = None
 
-if "cardback_image" not in st.session_state:
-    st.session_state["cardback_image"] = None
+if "cardback_bytes" not in st.session_state:
+    st.session_state["cardback_bytes"] = None
 
-def create_card_grids(card_images, cardback_image=None, output_dir="output_cards"):
-    # A4 dimensions in pixels at 300 DPI (for high-quality print)
-    a4_width_px = int(21.0 / 2.54 * 300)
-    a4_height_px = int(29.7 / 2.54 * 300)
-    
-    # Card size in pixels at 300 DPI
-    card_width_px = int(6.4 / 2.54 * 300)
-    card_height_px = int(8.9 / 2.54 * 300)
+if "cardback_hash" not in st.session_state:
+    st.session_state["cardback_hash"] = None
+
+# Layout parameters of the exported files, part of their artifact store keys; the exports are rendered
+# from these alone, so a key always describes what was rendered.
+# PDF: A4 pages at 300 DPI (for high-quality print) with 6.4 x 8.9 cm cards, margin from the edge of the
+# page and space between cards in pixels. Grids: Instagram-friendly width, cards per row and rows, and the
+# card aspect ratio (6.4 x 8.9 cm).
+PDF_LAYOUT = {"page_cm": [21.0, 29.7], "dpi": 300, "card_cm": [6.4, 8.9], "margin_px": 50, "padding_px": 20}
+MAJOR_GRID_LAYOUT = {"width_px": 1080, "height_px": 1080, "columns": 6, "rows": 4, "card_aspect": 1.39}
+MINOR_GRID_LAYOUT = {"width_px": 1080, "columns": 14, "rows": 4, "card_aspect": 1.39}
+
+
+def cm_to_px(cm, dpi):
+    return int(cm / 2.54 * dpi)
+
+
+# Width and (fractional) height of a card in a grid
+def grid_card_size(layout):
+    card_width_px = layout["width_px"] // layout["columns"]
+    return card_width_px, card_width_px * layout["card_aspect"]
+
+
+# Content hash of the loaded deck, computed once per loaded deck
+def current_deck_hash(tarot_deck):
+    if st.session_state.get("tarot_deck_hash") is None:
+        st.session_state["tarot_deck_hash"] = deck_content_hash(tarot_deck)
+    return st.session_state["tarot_deck_hash"]
+
+
+# Content hashes of the loaded deck's cards, computed once per loaded deck
+def current_card_hashes(tarot_deck):
+    if st.session_state.get("tarot_card_hashes") is None:
+        st.session_state["tarot_card_hashes"] = [
+            card_content_hash(card) for card in tarot_deck.major_arcana + tarot_deck.minor_arcana
+        ]
+    return st.session_state["tarot_card_hashes"]
+
+
+# Cards of the loaded deck with their images; library decks are kept as text only in the session,
+# so their images are read per card, only when an export is rendered
+def imaged_cards(tarot_deck, card_ids):
+    card_ids = list(card_ids)
+    deck_id = st.session_state.get("tarot_deck_id")
+    if deck_id is not None:
+        return get_library().load_cards(deck_id, card_ids=card_ids, renditions=RENDITIONS)
+    cards = tarot_deck.major_arcana + tarot_deck.minor_arcana
+    return [cards[card_id] for card_id in card_ids]
+
+
+# Path of a stored artifact still present in the store, None once it was evicted
+def stored_artifact(key):
+    path = st.session_state.get(key)
+    if path is not None and not os.path.exists(path):
+        st.session_state[key] = None
+        return None
+    return path
+
+# card_hashes: content hash of every card; load_cards(card_ids) returns the cards with their images
+@traced("create_card_grids")
+def create_card_grids(card_hashes, load_cards, cardback_bytes=None, cardback_hash=None):
+    Image = lazy_import("PIL.Image")
+    img2pdf = lazy_import("img2pdf")
+    store = get_artifact_store()
+
+    # Page and card dimensions in pixels
+    dpi = PDF_LAYOUT["dpi"]
+    a4_width_px, a4_height_px = (cm_to_px(cm, dpi) for cm in PDF_LAYOUT["page_cm"])
+    card_width_px, card_height_px = (cm_to_px(cm, dpi) for cm in PDF_LAYOUT["card_cm"])
     
     # Margins and padding
-    margin_px = 50  # Margin from the edge of the page
-    padding_px = 20  # Space between cards
+    margin_px = PDF_LAYOUT["margin_px"]
+    padding_px = PDF_LAYOUT["padding_px"]
     
     # Calculate the number of cards per row and column
     cards_per_row = (a4_width_px - 2 * margin_px + padding_px) // (card_width_px + padding_px)
@@ -113,77 +170,82 @@ def create_card_grids(card_images, cardback_image=None, output_dir="output_cards
     # Calculate how many cards fit per page
     cards_per_page = cards_per_row * cards_per_col
     
-    # Ensure output directory exists
-    os.makedirs(output_dir, exist_ok=True)
-    
-    num_pages = math.ceil(len(card_images) / cards_per_page)
-    image_paths = []
+    num_pages = math.ceil(len(card_hashes) / cards_per_page)
+    page_images = []
 
-    for page in range(num_pages):
+    def card_position(idx):
+        # Calculate position of the card in the grid
+        row = idx // cards_per_row
+        col = idx % cards_per_row
+        return margin_px + col * (card_width_px + padding_px), margin_px + row * (card_height_px + padding_px)
+
+    def build_front_page(card_ids):
         # Create a new blank A4 image
         a4_image_front = Image.new("RGB", (a4_width_px, a4_height_px), "white")
-        a4_image_back = Image.new("RGB", (a4_width_px, a4_height_px), "white") if cardback_image else None
-        
+        for idx, card in enumerate(load_cards(card_ids)):
+            # Resized from the original, the only stored image large enough for print-size cards
+            with span("create_card_grids.resize"):
+                card_image_resized = card_pil_image(card, card_width_px, card_height_px)
+            a4_image_front.paste(card_image_resized, card_position(idx))
+        return png_bytes(a4_image_front)
+
+    def build_back_page(num_cards):
+        # The cardback is the same for every card, resize it once
+        cardback_resized = decode_image(cardback_bytes).resize((card_width_px, card_height_px), Image.Resampling.LANCZOS)
+        a4_image_back = Image.new("RGB", (a4_width_px, a4_height_px), "white")
+        for idx in range(num_cards):
+            a4_image_back.paste(cardback_resized, card_position(idx))
+        return png_bytes(a4_image_back)
+
+    # Pages are stored by the cards they show, so after a card changed only its own page is rendered again
+    for page in range(num_pages):
         # Determine the slice of cards for this page
-        start_idx = page * cards_per_page
-        end_idx = min((page + 1) * cards_per_page, len(card_images))
-        current_cards = card_images[start_idx:end_idx]
-        
-        for idx, card_image in enumerate(current_cards):
-            # Calculate position of the card in the grid
-            row = idx // cards_per_row
-            col = idx % cards_per_row
-            x = margin_px + col * (card_width_px + padding_px)
-            y = margin_px + row * (card_height_px + padding_px)
-
-            # Resize and paste the card onto the A4 image
-            card_image_resized = card_image.resize((card_width_px, card_height_px), Image.Resampling.LANCZOS)
-            a4_image_front.paste(card_image_resized, (x, y))
-            
-            if cardback_image:
-                cardback_resized = cardback_image.resize((card_width_px, card_height_px), Image.Resampling.LANCZOS)
-                a4_image_back.paste(cardback_resized, (x, y))
-        
-        # Save the resulting images for this page
-        output_front_path = os.path.join(output_dir, f"cards_page_{page + 1}_front.png")
-        a4_image_front.save(output_front_path, "PNG")
-        image_paths.append(output_front_path)
-
-        if cardback_image:
-            output_back_path = os.path.join(output_dir, f"cards_page_{page + 1}_back.png")
-            a4_image_back.save(output_back_path, "PNG")
-            image_paths.append(output_back_path)
-    
-    # Generate a unique filename using UUID
-    unique_filename = f"{uuid.uuid4()}.pdf"
-    pdf_path = os.path.join(output_dir, unique_filename)
+        card_ids = range(page * cards_per_page, min(len(card_hashes), (page + 1) * cards_per_page))
+
+        front_key = artifact_key("cards_pdf_front_page", ",".join(card_hashes[card_id] for card_id in card_ids), **PDF_LAYOUT)
+        with span("create_card_grids.page", page=page + 1):
+            front_path = store.get_or_create(front_key, "png", lambda: build_front_page(card_ids))
+            with open(front_path, "rb") as f:
+                page_images.append(f.read())
+
+        if cardback_bytes:
+            back_key = artifact_key("cards_pdf_back_page", "", cardback_hash, cards=len(card_ids), **PDF_LAYOUT)
+            with span("create_card_grids.page", page=page + 1, side="back"):
+                back_path = store.get_or_create(back_key, "png", lambda: build_back_page(len(card_ids)))
+                with open(back_path, "rb") as f:
+                    page_images.append(f.read())
     
     # Convert the PNGs to a single PDF file
-    pdf_bytes = img2pdf.convert(image_paths)
-    
-    with open(pdf_path, "wb") as f:
-        f.write(pdf_bytes)
+    with span("create_card_grids.pdf_encode", pages=len(page_images)):
+        pdf_bytes = img2pdf.convert(page_images)
     
-    # Return the PDF path for download
-    return pdf_path
+    # Return the PDF bytes for the artifact store
+    return pdf_bytes
+
+
+def png_bytes(image):
+    buffered = BytesIO()
+    image.save(buffered, "PNG")
+    return buffered.getvalue()
 
 
-def create_major_arcana_grid(card_images, output_path="major_arcana_grid.png"):
-    # Instagram-friendly dimensions (1080x1080 pixels or similar)
-    image_size_px = 1080  # Example square size, adjust as needed
-    card_width_px = image_size_px // 6  # Adjust grid size to fit cards
-    card_height_px = card_width_px * 1.39  # Keeping aspect ratio 6.4 x 8.9 cm
+@traced("create_major_arcana_grid")
+def create_major_arcana_grid(card_images):
+    Image = lazy_import("PIL.Image")
+
+    columns = MAJOR_GRID_LAYOUT["columns"]
+    card_width_px, card_height_px = grid_card_size(MAJOR_GRID_LAYOUT)
     
     # Create a blank image for the grid
-    grid_image = Image.new("RGB", (image_size_px, image_size_px), "white")
+    grid_image = Image.new("RGB", (MAJOR_GRID_LAYOUT["width_px"], MAJOR_GRID_LAYOUT["height_px"]), "white")
     
-    # Arrange cards in a 6x4 grid
+    # Arrange cards in a columns x rows grid
     for idx, card_image in enumerate(card_images):
-        if idx >= 22:
-            break  # Stop if we've placed all Major Arcana cards
+        if idx >= columns * MAJOR_GRID_LAYOUT["rows"]:
+            break  # Stop if the grid is full
 
-        row = idx // 6
-        col = idx % 6
+        row = idx // columns
+        col = idx % columns
         x = int(col * card_width_px)
         y = int(row * card_height_px)
         
@@ -191,26 +253,26 @@ def create_major_arcana_grid(card_images, output_path="major_arcana_grid.png"):
         card_image_resized = card_image.resize((int(card_width_px), int(card_height_px)), Image.Resampling.LANCZOS)
         grid_image.paste(card_image_resized, (x, y))
     
-    # Save the grid image
-    grid_image.save(output_path, "PNG")
-    return output_path
-
-def create_minor_arcana_grid(card_images, output_path="minor_arcana_grid.png"):
-    # Instagram-friendly dimensions (1080x1080 pixels or similar)
-    image_width_px = 1080  # Example width, adjust as needed
-    card_width_px = image_width_px // 14  # 14 cards per row
-    card_height_px = card_width_px * 1.39  # Keeping aspect ratio 6.4 x 8.9 cm
+    # Encode the grid image
+    return png_bytes(grid_image)
+
+@traced("create_minor_arcana_grid")
+def create_minor_arcana_grid(card_images):
+    Image = lazy_import("PIL.Image")
+
+    columns = MINOR_GRID_LAYOUT["columns"]
+    card_width_px, card_height_px = grid_card_size(MINOR_GRID_LAYOUT)
     
-    # Total height required for 4 rows
-    image_height_px = card_height_px * 4
+    # Total height required for all rows
+    image_height_px = card_height_px * MINOR_GRID_LAYOUT["rows"]
     
     # Create a blank image for the grid
-    grid_image = Image.new("RGB", (int(image_width_px), int(image_height_px)), "white")
+    grid_image = Image.new("RGB", (MINOR_GRID_LAYOUT["width_px"], int(image_height_px)), "white")
     
-    # Arrange cards in 4 rows (one row per suit)
+    # Arrange cards in rows (one row per suit)
     for idx, card_image in enumerate(card_images):
-        row = idx // 14
-        col = idx % 14
+        row = idx // columns
+        col = idx % columns
         x = int(col * card_width_px)
         y = int(row * card_height_px)
         
@@ -218,9 +280,8 @@ def create_minor_arcana_grid(card_images, output_path="minor_arcana_grid.png"):
         card_image_resized = card_image.resize((int(card_width_px), int(card_height_px)), Image.Resampling.LANCZOS)
         grid_image.paste(card_image_resized, (x, y))
     
-    # Save the grid image
-    grid_image.save(output_path, "PNG")
-    return output_path
+    # Encode the grid image
+    return png_bytes(grid_image)
 
 
 def download_pdf(pdf_path):
@@ -230,49 +291,72 @@ def download_pdf(pdf_path):
 
 
 st.title("🔎 Tarot Card Deck Explorer")
-st.markdown("""This app allows you to explore a Tarot Card Deck fetched from a Gist URL.
-            Please enter the Gist URL for the Tarot Deck JSON to get started.""")
-
-gist_url = st.text_input("Enter the Gist URL for the Tarot Deck JSON:")
-
-if gist_url:
+st.markdown("""This app allows you to explore a Tarot Card Deck from the deck library or fetched from a Gist URL.
+            Please select a library deck or enter the Gist URL for the Tarot Deck JSON to get started.""")
+
+library_deck_id, gist_url = pick_deck_source("explorer")
+
+if library_deck_id:
+    # Library decks are loaded by ID once per session instead of being re-fetched on every rerun,
+    # and loaded again when one of their cards was edited since. Only the card texts are kept in the
+    # session; images are read per card for the visible gallery page, opened cards and exports.
+    library = get_library()
+    library_deck_hash = library.get_deck_info(library_deck_id)["content_hash"]
+    if st.session_state.get("tarot_deck_id") != library_deck_id or st.session_state.get("tarot_deck_hash") != library_deck_hash:
+        st.session_state["tarot_deck"] = library.load_deck(library_deck_id, with_images=False)
+        st.session_state["tarot_deck_id"] = library_deck_id
+        st.session_state["tarot_deck_hash"] = library_deck_hash
+        st.session_state["tarot_card_hashes"] = library.card_hashes(library_deck_id)
+elif gist_url:
     tarot_deck = fetch_tarot_deck_from_gist(gist_url)
     st.session_state["tarot_deck"] = tarot_deck
+    st.session_state["tarot_deck_id"] = None
+    st.session_state["tarot_deck_hash"] = None
+    st.session_state["tarot_card_hashes"] = None
+    if tarot_deck is not None:
+        offer_library_import(tarot_deck, gist_url, key="explorer")
 
 if st.session_state["tarot_deck"] is not None:
-    st.success("Tarot deck fetched successfully!")
+    tarot_deck = session_value("tarot_deck")
+    st.success("Tarot deck loaded successfully!")
 
     st.markdown("""## Generate Tarot Card Grids  
                 You can generate grids of the Major Arcana and Minor Arcana cards in the Tarot Deck
                 """)
     if st.button("Generate Major Arcana Grid PNG"):
-        major_arcana_images = []
-        for card in tarot_deck.major_arcana:
-            image_data = base64.b64decode(card.image_base64)
-            image = Image.open(BytesIO(image_data))
-            major_arcana_images.append(image)
-        
-        major_arcana_path = create_major_arcana_grid(major_arcana_images)
-        st.session_state["major_arcana_images"] = major_arcana_path
-
-    if st.session_state["major_arcana_images"] is not None:
-        st.image(st.session_state["major_arcana_images"], caption="Major Arcana Grid", use_column_width=True)
+        def build_major_arcana_grid():
+            card_width_px, card_height_px = grid_card_size(MAJOR_GRID_LAYOUT)
+            major_arcana_images = []
+            for card in imaged_cards(tarot_deck, range(len(tarot_deck.major_arcana))):
+                # Grid-size cards, covered by the thumbnail rendition
+                major_arcana_images.append(card_pil_image(card, card_width_px, int(card_height_px)))
+            return create_major_arcana_grid(major_arcana_images)
+
+        # A deck exported before is served from the artifact store without rendering it again
+        key = artifact_key("major_arcana_grid", current_deck_hash(tarot_deck), **MAJOR_GRID_LAYOUT)
+        st.session_state["major_arcana_images"] = get_artifact_store().get_or_create(key, "png", build_major_arcana_grid)
+
+    if stored_artifact("major_arcana_images") is not None:
+        show_image(st.session_state["major_arcana_images"], caption="Major Arcana Grid")
         with open(st.session_state["major_arcana_images"], "rb") as f:
             uuid_number = uuid.uuid4()
             st.download_button(label="Download Major Arcana Grid PNG", data=f, file_name=f"major_arcana_grid_{uuid_number}.png", mime="image/png")
 
     if st.button("Generate Minor Arcana Grid PNG"):
-        minor_arcana_images = []
-        for card in tarot_deck.minor_arcana:
-            image_data = base64.b64decode(card.image_base64)
-            image = Image.open(BytesIO(image_data))
-            minor_arcana_images.append(image)
-        
-        minor_arcana_path = create_minor_arcana_grid(minor_arcana_images)
-        st.session_state["minor_arcana_images"] = minor_arcana_path
-
-    if st.session_state["minor_arcana_images"] is not None:
-        st.image(st.session_state["minor_arcana_images"], caption="Minor Arcana Grid", use_column_width=True)
+        def build_minor_arcana_grid():
+            card_width_px, card_height_px = grid_card_size(MINOR_GRID_LAYOUT)
+            minor_arcana_images = []
+            num_major = len(tarot_deck.major_arcana)
+            for card in imaged_cards(tarot_deck, range(num_major, num_major + len(tarot_deck.minor_arcana))):
+                # Grid-size cards, covered by the thumbnail rendition
+                minor_arcana_images.append(card_pil_image(card, card_width_px, int(card_height_px)))
+            return create_minor_arcana_grid(minor_arcana_images)
+
+        key = artifact_key("minor_arcana_grid", current_deck_hash(tarot_deck), **MINOR_GRID_LAYOUT)
+        st.session_state["minor_arcana_images"] = get_artifact_store().get_or_create(key, "png", build_minor_arcana_grid)
+
+    if stored_artifact("minor_arcana_images") is not None:
+        show_image(st.session_state["minor_arcana_images"], caption="Minor Arcana Grid")
         with open(st.session_state["minor_arcana_images"], "rb") as f:
             uuid_number = uuid.uuid4()
             st.download_button(label="Download Minor Arcana Grid PNG", data=f, file_name=f"minor_arcana_grid_{uuid_number}.png", mime="image/png")
@@ -282,11 +366,12 @@ if st.session_state["tarot_deck"] is not None:
                 """)
     cardback_prompt = st.text_input("Enter a prompt for the cardback generator:")
     if st.button("Generate Cardback"):
-        cardback_image = generate_cardback(cardback_prompt)
-        st.session_state["cardback_image"] = cardback_image
+        cardback_bytes = generate_cardback(cardback_prompt)
+        st.session_state["cardback_bytes"] = cardback_bytes
+        st.session_state["cardback_hash"] = hashlib.sha256(cardback_bytes).hexdigest()
     
-    if st.session_state["cardback_image"] is not None:
-        st.image(st.session_state["cardback_image"], caption="Generated Cardback", use_column_width=True)
+    if st.session_state["cardback_bytes"] is not None:
+        show_image(session_value("cardback_bytes"), caption="Generated Cardback")
 
     st.markdown("""## Tarot Deck PDF Generator  
                 You can generate a PDF file containing all the Tarot Cards in the Deck.
@@ -294,35 +379,34 @@ if st.session_state["tarot_deck"] is not None:
                 """)
 
     if st.button("Generate Tarot Cards PDF"):
-        card_images = []
-        for card in tarot_deck.major_arcana + tarot_deck.minor_arcana:
-            image_data = base64.b64decode(card.image_base64)
-            image = Image.open(BytesIO(image_data))
-            card_images.append(image)
-
-        cardback_image = st.session_state.get("cardback_image", None)
-        pdf_path = create_card_grids(card_images, cardback_image=st.session_state["cardback_image"])
-        st.session_state["deck_pdf_path"] = pdf_path
+        def build_cards_pdf():
+            return create_card_grids(
+                current_card_hashes(tarot_deck),
+                lambda card_ids: imaged_cards(tarot_deck, card_ids),
+                cardback_bytes=session_value("cardback_bytes"),
+                cardback_hash=st.session_state["cardback_hash"],
+            )
+
+        key = artifact_key("cards_pdf", current_deck_hash(tarot_deck), st.session_state["cardback_hash"], **PDF_LAYOUT)
+        st.session_state["deck_pdf_path"] = get_artifact_store().get_or_create(key, "pdf", build_cards_pdf)
     
-    if st.session_state["deck_pdf_path"] is not None:
+    if stored_artifact("deck_pdf_path") is not None:
         download_pdf(st.session_state["deck_pdf_path"])
 
 
+    major_loader = minor_loader = None
+    deck_id = st.session_state.get("tarot_deck_id")
+    if deck_id is not None:
+        num_major = len(tarot_deck.major_arcana)
+        major_loader = lambda card_idx, width, height: get_library().load_card_image(deck_id, card_idx, width, height)
+        minor_loader = lambda card_idx, width, height: get_library().load_card_image(deck_id, num_major + card_idx, width, height)
+
     st.header("Major Arcana")
-    for card in tarot_deck.major_arcana:
-        with st.expander(card.name):
-            st.write(f"**Description**: {card.description}")
-            st.write(f"**Divinatory Meaning**: {card.divinatory_meaning}")
-            st.write(f"**Reversed Meaning**: {card.reversed}")
-            st.write(f"**Physical Description**: {card.physical_description}")
-            display_card_image(card, reversed=False)
+    render_card_gallery(tarot_deck.major_arcana, key="explorer_major", image_loader=major_loader)
 
     st.header("Minor Arcana")
-    for card in tarot_deck.minor_arcana:
-        with st.expander(card.name):
-            st.write(f"**Description**: {card.description}")
-            st.write(f"**Divinatory Meaning**: {card.divinatory_meaning}")
-            st.write(f"**Reversed Meaning**: {card.reversed}")
-            st.write(f"**Physical Description**: {card.physical_description}")
-            display_card_image(card, reversed=False)
+    render_card_gallery(tarot_deck.minor_arcana, key="explorer_minor", image_loader=minor_loader)
 
+account_session_state(spillable=("tarot_deck", "cardback_bytes"))
+render_trace_panel()
+startup.rendered()
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from tarotGPT.tracing import span
+
+# Bounded store for derived artifacts (grid PNGs, printable PDFs). An artifact is addressed by what it
+# is rendered from: the deck content hash, the cardback hash and the layout parameters, so exporting a
+# known deck again returns the stored file instead of rendering it again.
+#
+#   <root>/<key[:2]>/<key>.<ext>
+#
+# The store is capped at TAROTGPT_ARTIFACT_MAX_BYTES (default 1 GB), evicting the least recently used
+# files first, and files older than TAROTGPT_ARTIFACT_TTL seconds (default 7 days) are dropped.
+
+
+def artifact_key(kind: str, deck_hash: str, cardback_hash: Optional[str] = None, **layout) -> str:
+    payload = json.dumps(
+        {"kind": kind, "deck_hash": deck_hash, "cardback_hash": cardback_hash, "layout": layout}, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ArtifactStore:
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.root = root or os.environ.get("TAROTGPT_ARTIFACT_DIR", "artifacts")
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.environ.get("TAROTGPT_ARTIFACT_MAX_BYTES", 1024 ** 3))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.environ.get("TAROTGPT_ARTIFACT_TTL", 7 * 24 * 3600))
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{ext}")
+
+    # Path of a stored artifact, or None; a hit counts as a use for LRU eviction
+    def get(self, key: str, ext: str) -> Optional[str]:
+        path = self._path(key, ext)
+        try:
+            created = os.stat(path).st_mtime
+            if time.time() - created > self.ttl_seconds:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            # The access time records the last use, the modification time the creation
+            os.utime(path, (time.time(), created))
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, key: str, ext: str, data: bytes) -> str:
+        path = self._path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return path
+
+    # Return the stored artifact, rendering and storing it with build() on a miss
+    def get_or_create(self, key: str, ext: str, build: Callable[[], bytes]) -> str:
+        path = self.get(key, ext)
+        if path is not None:
+            return path
+        with span("artifact_store.build", ext=ext):
+            data = build()
+        return self.put(key, ext, data)
+
+    def _entries(self):
+        entries = []
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat))
+        return entries
+
+    # Drop expired artifacts, then the least recently used ones until the store fits its size cap
+    def evict(self, keep: Optional[str] = None):
+        with self._lock:
+            now = time.time()
+            entries = []
+            for path, stat in self._entries():
+                if now - stat.st_mtime > self.ttl_seconds and path != keep:
+                    self._remove(path)
+                else:
+                    entries.append((path, stat))
+
+            total = sum(stat.st_size for _, stat in entries)
+            for path, stat in sorted(entries, key=lambda entry: entry[1].st_atime):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                self._remove(path)
+                total -= stat.st_size
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+            self.evictions += 1
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            return {
+                "artifacts": len(entries),
+                "bytes": sum(stat.st_size for _, stat in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_artifact_store = None
+_artifact_store_lock = threading.Lock()
+
+
+# Process-wide artifact store shared by all sessions
+def get_artifact_store() -> ArtifactStore:
+    global _artifact_store
+    with _artifact_store_lock:
+        if _artifact_store is None:
+            _artifact_store = ArtifactStore()
+        return _artifact_store
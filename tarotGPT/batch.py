@@ -0,0 +1,214 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from tarotGPT.clients import client_stats, get_openai_client
+from tarotGPT.generation import description_batches, generate_card_image, generate_deck, generate_physical_descriptions
+from tarotGPT.models import ImagedArcana, ImagedTarotDeck, TarotDeck
+from tarotGPT.scheduler import Priority
+
+# Headless batch deck generation: complete imaged decks for a list of themes, generated in parallel.
+#
+# All decks share one pool of workers for description and image calls, on top of the process-wide
+# OpenAI and Flux schedulers that enforce the rate and concurrency limits. Every finished step is
+# checkpointed under <output_dir>/.work/<deck>/, so an interrupted run resumes where it stopped:
+#
+#   .work/<deck>/deck.json          the deck text (TarotDeck)
+#   .work/<deck>/descriptions.json  physical descriptions by card index
+#   .work/<deck>/cards/<index>.json finished cards (ImagedArcana)
+#   <deck>.json                     the finished deck in the Deck Creator download format
+#
+#   python -m tarotGPT.batch "Oceanic Adventures" "Space Exploration" --output-dir decks
+
+
+def deck_slug(theme: str) -> str:
+    name = re.sub(r"[^a-z0-9]+", "-", theme.lower()).strip("-")[:40] or "deck"
+    return f"{name}-{hashlib.sha256(theme.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _write_json(path: str, data: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+class Progress:
+    def __init__(self, stream=sys.stdout):
+        self.stream = stream
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def report(self, theme: str, message: str):
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            print(f"[{elapsed:7.1f}s] {theme}: {message}", file=self.stream, flush=True)
+
+
+class BatchDeckGenerator:
+    def __init__(self, output_dir: str = "decks", concurrency: int = 8, batch_descriptions: bool = True,
+                 save_to_library: bool = False, client=None, progress: Optional[Progress] = None):
+        self.output_dir = output_dir
+        self.batch_descriptions = batch_descriptions
+        self.save_to_library = save_to_library
+        self.client = client or get_openai_client()
+        self.progress = progress or Progress()
+        # Shared by all decks; tasks on it never wait for other tasks on it
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-decks")
+
+    def _work_dir(self, slug: str) -> str:
+        return os.path.join(self.output_dir, ".work", slug)
+
+    def deck_path(self, theme: str) -> str:
+        return os.path.join(self.output_dir, f"{deck_slug(theme)}.json")
+
+    def _deck_text(self, theme: str, work_dir: str) -> TarotDeck:
+        path = os.path.join(work_dir, "deck.json")
+        data = _read_json(path)
+        if data is not None:
+            return TarotDeck(**data)
+        deck = generate_deck(self.client, theme, priority=Priority.BULK)
+        _write_json(path, deck.json())
+        return deck
+
+    def _descriptions(self, theme: str, arcana_list, num_major: int, work_dir: str) -> Dict[int, str]:
+        path = os.path.join(work_dir, "descriptions.json")
+        descriptions = {int(idx): description for idx, description in (_read_json(path) or {}).items()}
+        missing = [idx for idx in range(len(arcana_list)) if idx not in descriptions]
+        if not missing:
+            return descriptions
+
+        if self.batch_descriptions:
+            batches = [[idx for idx in batch if idx in missing] for batch in description_batches(arcana_list, num_major)]
+        else:
+            batches = [[idx] for idx in missing]
+        futures = {
+            self.executor.submit(generate_physical_descriptions, self.client, [arcana_list[idx] for idx in batch]): batch
+            for batch in batches if batch
+        }
+        for future, batch in futures.items():
+            descriptions.update(zip(batch, future.result()))
+            _write_json(path, json.dumps(descriptions))
+        self.progress.report(theme, f"{len(descriptions)} physical descriptions")
+        return descriptions
+
+    def _card(self, arcana, description: str, path: str) -> ImagedArcana:
+        image_base64, renditions = generate_card_image(description, tier="final", priority=Priority.BULK)
+        card = ImagedArcana(
+            name=arcana.name,
+            description=arcana.description,
+            divinatory_meaning=arcana.divinatory_meaning,
+            reversed=arcana.reversed,
+            physical_description=description,
+            image_base64=image_base64,
+            renditions=renditions,
+        )
+        _write_json(path, card.json())
+        return card
+
+    # Generate one deck, resuming from its checkpoints; returns the path of the finished deck file
+    def generate(self, theme: str) -> str:
+        output_path = self.deck_path(theme)
+        if os.path.exists(output_path):
+            self.progress.report(theme, f"already done ({output_path})")
+            return output_path
+
+        work_dir = self._work_dir(deck_slug(theme))
+        deck = self._deck_text(theme, work_dir)
+        arcana_list = deck.major_arcana + deck.minor_arcana
+        descriptions = self._descriptions(theme, arcana_list, len(deck.major_arcana), work_dir)
+
+        cards: List[Optional[ImagedArcana]] = [None] * len(arcana_list)
+        futures = {}
+        for idx, arcana in enumerate(arcana_list):
+            card_path = os.path.join(work_dir, "cards", f"{idx}.json")
+            data = _read_json(card_path)
+            if data is not None:
+                cards[idx] = ImagedArcana(**data)
+            else:
+                futures[idx] = self.executor.submit(self._card, arcana, descriptions[idx], card_path)
+
+        resumed = len(arcana_list) - len(futures)
+        if resumed:
+            self.progress.report(theme, f"resumed {resumed} finished cards")
+        for done, (idx, future) in enumerate(futures.items(), start=1):
+            cards[idx] = future.result()
+            if done % 10 == 0 or done == len(futures):
+                self.progress.report(theme, f"{resumed + done}/{len(arcana_list)} card images")
+
+        imaged_deck = ImagedTarotDeck(major_arcana=cards[:len(deck.major_arcana)], minor_arcana=cards[len(deck.major_arcana):])
+        _write_json(output_path, imaged_deck.json())
+        if self.save_to_library:
+            from tarotGPT.library import get_library
+            deck_id = get_library().add_deck(imaged_deck, name=theme, theme=theme, source="batch")
+            self.progress.report(theme, f"saved to the deck library as {deck_id}")
+        self.progress.report(theme, f"done ({output_path})")
+        return output_path
+
+    # Generate all decks in parallel; failed decks are reported and keep their checkpoints for the next run
+    def generate_all(self, themes: List[str]) -> Dict[str, Optional[str]]:
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, len(themes)), thread_name_prefix="batch-deck") as deck_executor:
+            futures = {theme: deck_executor.submit(self.generate, theme) for theme in themes}
+            for theme, future in futures.items():
+                try:
+                    results[theme] = future.result()
+                except Exception as e:
+                    self.progress.report(theme, f"failed: {e!r}")
+                    results[theme] = None
+        self.executor.shutdown()
+        return results
+
+
+def generate_decks(themes: List[str], output_dir: str = "decks", concurrency: int = 8, batch_descriptions: bool = True,
+                   save_to_library: bool = False) -> Dict[str, Optional[str]]:
+    generator = BatchDeckGenerator(
+        output_dir=output_dir, concurrency=concurrency, batch_descriptions=batch_descriptions, save_to_library=save_to_library
+    )
+    results = generator.generate_all(themes)
+    generator.progress.report("batch", json.dumps(client_stats()))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate complete imaged tarot decks for a list of themes")
+    parser.add_argument("themes", nargs="*", help="deck themes")
+    parser.add_argument("--themes-file", help="file with one theme per line")
+    parser.add_argument("--output-dir", default="decks")
+    parser.add_argument("--concurrency", type=int, default=8, help="description and image calls in flight across all decks")
+    parser.add_argument("--per-card-descriptions", action="store_true", help="one GPT call per card instead of per suit")
+    parser.add_argument("--save-to-library", action="store_true", help="also store the decks in the deck library")
+    args = parser.parse_args(argv)
+
+    themes = list(args.themes)
+    if args.themes_file:
+        with open(args.themes_file, "r") as f:
+            themes.extend(line.strip() for line in f if line.strip())
+    if not themes:
+        parser.error("no themes given")
+
+    results = generate_decks(
+        themes, output_dir=args.output_dir, concurrency=args.concurrency,
+        batch_descriptions=not args.per_card_descriptions, save_to_library=args.save_to_library,
+    )
+    return 0 if all(results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+from tarotGPT.image_backends import get_image_router
+from tarotGPT.imaging import DEFAULT_TIER, inference_key
+from tarotGPT.scheduler import Priority, get_scheduler
+from tarotGPT.singleflight import SingleFlight
+from tarotGPT.startup_profile import lazy_import
+
+# Entry points for every GPT and Flux call; each one goes through the shared AdaptiveScheduler.
+
+
+_openai_client = None
+
+
+# Process-wide OpenAI client; openai is only imported once a page actually talks to GPT. The SDK's own
+# retries are off so every 429 and 5xx reaches the scheduler, the only retry layer.
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = lazy_import("openai").Client(max_retries=0)
+    return _openai_client
+
+
+# Rough token estimate for budgeting before the request is sent (about 4 characters per token)
+def estimate_tokens(messages, max_tokens=None) -> int:
+    prompt_tokens = sum(len(message["content"]) for message in messages) // 4
+    return prompt_tokens + (max_tokens or 1000)
+
+
+def _call_with_headers(scheduler, create, estimated, **kwargs):
+    raw = create(**kwargs)
+    scheduler.observe_headers(raw.headers)
+    completion = raw.parse()
+    usage = getattr(completion, "usage", None)
+    if usage is not None:
+        scheduler.settle_tokens(estimated, usage.total_tokens)
+    return completion
+
+
+def chat_completion(client, priority: Priority = Priority.INTERACTIVE, **kwargs):
+    scheduler = get_scheduler("openai")
+    estimated = estimate_tokens(kwargs["messages"], kwargs.get("max_tokens"))
+    return scheduler.run(
+        _call_with_headers, scheduler, client.chat.completions.with_raw_response.create, estimated,
+        priority=priority, tokens=estimated, **kwargs,
+    )
+
+
+# Structured-output variant of chat_completion (client.beta.chat.completions.parse)
+def parse_chat_completion(client, priority: Priority = Priority.INTERACTIVE, **kwargs):
+    scheduler = get_scheduler("openai")
+    estimated = estimate_tokens(kwargs["messages"], kwargs.get("max_tokens"))
+    return scheduler.run(
+        _call_with_headers, scheduler, client.beta.chat.completions.with_raw_response.parse, estimated,
+        priority=priority, tokens=estimated, **kwargs,
+    )
+
+
+# Identical image requests from any session of this frontend process share one remote call
+flux_single_flight = SingleFlight("flux_inference")
+
+
+# Generate a card image at the given render tier on the image backends (see image_backends), returns the JPEG bytes
+def flux_inference(prompt: str, priority: Priority = Priority.BULK, tier: str = DEFAULT_TIER, n_steps=None, seed=None,
+                   **kwargs) -> bytes:
+    if n_steps is not None:
+        kwargs["n_steps"] = n_steps
+    if seed is not None:
+        kwargs["seed"] = seed
+    return flux_single_flight.do(
+        inference_key(prompt, tier, n_steps, seed),
+        get_scheduler("flux").run, get_image_router().infer, prompt, priority=priority, tier=tier, **kwargs,
+    )
+
+
+# Counters of the shared schedulers and request coalescing, e.g. for the debug panel
+def client_stats():
+    return {
+        "openai_scheduler": get_scheduler("openai").stats(),
+        "flux_scheduler": get_scheduler("flux").stats(),
+        "flux_single_flight": dict(flux_single_flight.stats(), gpu_runs_saved=flux_single_flight.coalesced),
+        "image_router": get_image_router().stats(),
+    }
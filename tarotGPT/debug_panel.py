@@ -0,0 +1,71 @@
+import os
+
+import streamlit as st
+
+from tarotGPT.artifacts import get_artifact_store
+from tarotGPT.clients import client_stats
+from tarotGPT.tracing import bind_session
+
+# Optional Streamlit debug panel showing the span waterfall of the current session.
+# Enable it with TAROTGPT_DEBUG=1 or by opening a page with ?debug=1
+
+
+def debug_enabled() -> bool:
+    return os.environ.get("TAROTGPT_DEBUG") == "1" or st.query_params.get("debug") == "1"
+
+
+# Bind the session's span list so every span finished during this script run is collected
+def init_session_tracing():
+    if "trace_spans" not in st.session_state:
+        st.session_state["trace_spans"] = []
+    bind_session(st.session_state["trace_spans"])
+
+
+def render_trace_panel():
+    if not debug_enabled():
+        return
+
+    with st.sidebar.expander("Client counters", expanded=False):
+        st.json(client_stats())
+
+    with st.sidebar.expander("Artifact store", expanded=False):
+        st.json(get_artifact_store().stats())
+
+    with st.sidebar.expander("Image delivery", expanded=False):
+        st.json(st.session_state.get("image_delivery", {}))
+
+    with st.sidebar.expander("Session memory", expanded=False):
+        st.json(st.session_state.get("session_memory", {}))
+
+    spans = st.session_state.get("trace_spans", [])
+    with st.sidebar.expander("Trace waterfall", expanded=False):
+        if not spans:
+            st.write("No spans recorded yet.")
+            return
+
+        if st.button("Clear spans"):
+            spans.clear()
+            return
+
+        origin = min(span.start for span in spans)
+        rows = [
+            {
+                "span": f"{idx:03d} {span.name}",
+                "start_ms": round((span.start - origin) * 1000, 1),
+                "end_ms": round((span.end - origin) * 1000, 1),
+                "duration_ms": round(span.duration * 1000, 1),
+                "status": span.status,
+            }
+            for idx, span in enumerate(sorted(spans, key=lambda s: s.start))
+        ]
+
+        import altair as alt
+        chart = alt.Chart(alt.Data(values=rows)).mark_bar().encode(
+            x=alt.X("start_ms:Q", title="ms since first span"),
+            x2="end_ms:Q",
+            y=alt.Y("span:N", sort=None),
+            color="status:N",
+            tooltip=["span:N", "duration_ms:Q", "status:N"],
+        )
+        st.altair_chart(chart, use_container_width=True)
+        st.dataframe(rows, use_container_width=True)
@@ -0,0 +1,127 @@
+import base64
+import hashlib
+import random
+import re
+from typing import Dict, Iterable, List, Optional
+
+# Integer-indexed view of an ImagedTarotDeck.
+#
+# Cards get stable IDs (major arcana 0-21 followed by minor arcana in deck order), and name, suit,
+# rank and court lookups are computed once per deck, so drawing cards never compares card models
+# (and their multi-hundred-KB image payloads) with each other.
+
+RANKS = ("Ace", "Two", "Three", "Four", "Five", "Six", "Seven", "Eight", "Nine", "Ten",
+         "Page", "Knight", "Queen", "King")
+COURT_RANKS = ("Page", "Knight", "Queen", "King")
+
+_minor_name_pattern = re.compile(
+    r"^(?:the\s+)?(?P<rank>" + "|".join(RANKS) + r")\s+of\s+(?:the\s+)?(?P<suit>.+)$",
+    re.IGNORECASE,
+)
+
+
+# Split a minor arcana name such as "The Queen of Tides" into ("Queen", "Tides")
+def parse_minor_name(name: str):
+    match = _minor_name_pattern.match(name.strip())
+    if match is None:
+        return None, None
+    return match.group("rank").capitalize(), match.group("suit").strip()
+
+
+# Content hash of a deck, stable across re-fetches and independent of the Pydantic version
+def deck_content_hash(deck) -> str:
+    digest = hashlib.sha256()
+    for card in list(deck.major_arcana) + list(deck.minor_arcana):
+        for value in (card.name, card.description, card.divinatory_meaning, card.reversed,
+                      card.physical_description, card.image_base64):
+            digest.update(value.encode("utf-8"))
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# Content hash of a single card, e.g. to key derived artifacts that only depend on some cards of a deck.
+# The image enters as the SHA-256 of its bytes, which cards loaded without images pass as image_hash.
+def card_content_hash(card, image_hash: Optional[str] = None) -> str:
+    if image_hash is None:
+        image_hash = hashlib.sha256(base64.b64decode(card.image_base64)).hexdigest()
+    digest = hashlib.sha256()
+    for value in (card.name, card.description, card.divinatory_meaning, card.reversed,
+                  card.physical_description, image_hash):
+        digest.update(value.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class DeckIndex:
+    # For decks loaded without image payloads, pass the stored content hash and an image_loader(card_id)
+    # returning the full card, so images are only fetched for the cards actually shown
+    def __init__(self, deck, content_hash: Optional[str] = None, image_loader=None):
+        self.deck = deck
+        self.cards = list(deck.major_arcana) + list(deck.minor_arcana)
+        self.num_major = len(deck.major_arcana)
+        self._content_hash = content_hash
+        self._image_loader = image_loader
+        self._imaged_cards: Dict[int, object] = {}
+
+        self.ids_by_name: Dict[str, int] = {}
+        self.suits: List[Optional[str]] = []
+        self.ranks: List[Optional[str]] = []
+        for card_id, card in enumerate(self.cards):
+            self.ids_by_name.setdefault(card.name, card_id)
+            if card_id < self.num_major:
+                self.suits.append(None)
+                self.ranks.append(None)
+                continue
+            rank, suit = parse_minor_name(card.name)
+            if rank is None:
+                # Fall back to the generation order: 14 cards per suit, Ace to King
+                position = (card_id - self.num_major) % len(RANKS)
+                rank = next((r for r in COURT_RANKS if r in card.name), RANKS[position])
+            self.ranks.append(rank)
+            self.suits.append(suit)
+
+        self.court_ids = [card_id for card_id in range(self.num_major, len(self.cards)) if self.ranks[card_id] in COURT_RANKS]
+        self.ids_by_suit: Dict[str, List[int]] = {}
+        for card_id, suit in enumerate(self.suits):
+            if suit is not None:
+                self.ids_by_suit.setdefault(suit, []).append(card_id)
+
+    @property
+    def content_hash(self) -> str:
+        if self._content_hash is None:
+            self._content_hash = deck_content_hash(self.deck)
+        return self._content_hash
+
+    def __len__(self):
+        return len(self.cards)
+
+    def card(self, card_id: int):
+        return self.cards[card_id]
+
+    # The card including its image payload
+    def imaged_card(self, card_id: int):
+        if self._image_loader is None:
+            return self.cards[card_id]
+        if card_id not in self._imaged_cards:
+            self._imaged_cards[card_id] = self._image_loader(card_id)
+        return self._imaged_cards[card_id]
+
+    def id_of(self, name: str) -> Optional[int]:
+        return self.ids_by_name.get(name)
+
+    def is_major(self, card_id: int) -> bool:
+        return card_id < self.num_major
+
+    # Draw `num_cards` distinct card IDs not in `excluded_ids`, each with a 50:50 reversed flag
+    def draw(self, num_cards: int, excluded_ids: Iterable[int] = (), rng: Optional[random.Random] = None):
+        rng = rng or random.Random()
+        excluded = set(excluded_ids)
+        available = [card_id for card_id in range(len(self.cards)) if card_id not in excluded]
+
+        # Partial Fisher-Yates shuffle: only the first num_cards positions are settled
+        num_cards = min(num_cards, len(available))
+        for i in range(num_cards):
+            j = rng.randrange(i, len(available))
+            available[i], available[j] = available[j], available[i]
+
+        return [(card_id, rng.choice([True, False])) for card_id in available[:num_cards]]
@@ -0,0 +1,35 @@
+import streamlit as st
+
+from tarotGPT.library import get_library
+
+# Shared Step 0 widget: pick a deck from the local library or enter a Gist URL.
+# Returns (deck_id, gist_url), exactly one of which is set once the user made a choice.
+
+
+def pick_deck_source(key: str):
+    library = get_library()
+    decks = library.list_decks()
+
+    sources = ["Deck Library", "Gist URL"] if decks else ["Gist URL"]
+    source = st.radio("Load the Tarot Deck from:", sources, horizontal=True, key=f"{key}_deck_source")
+
+    if source == "Deck Library":
+        deck_id = st.selectbox(
+            "Select a deck from the library:",
+            [deck["deck_id"] for deck in decks],
+            format_func=lambda deck_id: next(
+                f"{deck['name']} ({deck['theme'] or 'no theme'})" for deck in decks if deck["deck_id"] == deck_id
+            ),
+            key=f"{key}_library_deck",
+        )
+        return deck_id, None
+
+    gist_url = st.text_input("Enter the Gist URL for the Tarot Deck JSON:", key=f"{key}_gist_url")
+    return None, gist_url or None
+
+
+# Offer to store a deck fetched from a Gist in the library so it can be loaded by ID next time
+def offer_library_import(deck, gist_url: str, key: str):
+    if st.button("Save deck to library", key=f"{key}_save_to_library"):
+        deck_id = get_library().add_deck(deck, name=gist_url.rstrip("/").split("/")[-1], source=gist_url)
+        st.success(f"Deck saved to the library as {deck_id}")
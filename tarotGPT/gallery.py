@@ -0,0 +1,79 @@
+import math
+import time
+
+import streamlit as st
+
+from tarotGPT.image_delivery import show_image
+from tarotGPT.renditions import RENDITIONS, card_image_bytes
+from tarotGPT.tracing import span
+
+# Paginated card gallery: only the thumbnails of the visible page are sent to the browser,
+# and the full-size image of a card is sent only after the user opens that card.
+# For cards loaded without images, pass image_loader(card_idx, width, height) returning the encoded image.
+
+
+def _show_card_details(card):
+    st.write(f"**Description**: {card.description}")
+    st.write(f"**Divinatory Meaning**: {card.divinatory_meaning}")
+    st.write(f"**Reversed Meaning**: {card.reversed}")
+    physical_description = getattr(card, "physical_description", None)
+    if physical_description:
+        st.write(f"**Physical Description**: {physical_description}")
+
+
+def _select_card(selected_key: str, card_idx):
+    st.session_state[selected_key] = card_idx
+
+
+def render_card_gallery(cards, key: str, page_size: int = 12, columns: int = 4, image_loader=None):
+    if image_loader is None:
+        image_loader = lambda card_idx, width, height: card_image_bytes(cards[card_idx], width, height)
+    started = time.perf_counter()
+    payload_bytes = 0
+
+    page_key = f"{key}_gallery_page"
+    selected_key = f"{key}_gallery_selected"
+    if page_key not in st.session_state:
+        st.session_state[page_key] = 0
+    if selected_key not in st.session_state:
+        st.session_state[selected_key] = None
+
+    num_pages = max(1, math.ceil(len(cards) / page_size))
+    page = min(st.session_state[page_key], num_pages - 1)
+
+    with span("render_card_gallery", gallery=key, page=page):
+        previous_col, label_col, next_col = st.columns([1, 2, 1])
+        if previous_col.button("◀ Previous", key=f"{key}_gallery_previous", disabled=page == 0):
+            page -= 1
+        if next_col.button("Next ▶", key=f"{key}_gallery_next", disabled=page >= num_pages - 1):
+            page += 1
+        st.session_state[page_key] = page
+        label_col.markdown(f"Page {page + 1} of {num_pages}")
+
+        start = page * page_size
+        visible = list(enumerate(cards))[start:start + page_size]
+        for row_start in range(0, len(visible), columns):
+            row = st.columns(columns)
+            for column, (card_idx, card) in zip(row, visible[row_start:row_start + columns]):
+                with column:
+                    payload_bytes += show_image(image_loader(card_idx, *RENDITIONS["thumbnail"]), caption=card.name)
+                    st.button("Open", key=f"{key}_gallery_open_{card_idx}",
+                              on_click=_select_card, args=(selected_key, card_idx))
+
+        # Full-size image and details only for the card the user opened
+        selected = st.session_state[selected_key]
+        if selected is not None and selected < len(cards):
+            card = cards[selected]
+            st.subheader(card.name)
+            _show_card_details(card)
+            payload_bytes += show_image(image_loader(selected, *RENDITIONS["preview"]), caption=card.name)
+            st.button("Close", key=f"{key}_gallery_close",
+                      on_click=_select_card, args=(selected_key, None))
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    caption = f"Gallery payload this rerun: {payload_bytes / 1024:.0f} KB in {elapsed_ms:.0f} ms"
+    full_payload_bytes = sum(len(card.image_base64) * 3 // 4 for card in cards)
+    if full_payload_bytes:
+        caption += f" (all {len(cards)} full-size images: {full_payload_bytes / 1024:.0f} KB)"
+    st.caption(caption)
+    return payload_bytes
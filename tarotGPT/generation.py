@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import base64
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+from tarotGPT.clients import chat_completion, flux_inference, parse_chat_completion
+from tarotGPT.deck_index import parse_minor_name
+from tarotGPT.models import Arcana, PhysicalDescriptionBatch, TarotDeck
+from tarotGPT.renditions import make_renditions
+from tarotGPT.scheduler import Priority
+from tarotGPT.tracing import span, submit_in_context, traced
+
+if TYPE_CHECKING:
+    import openai
+
+# Deck generation shared by the Deck Creator page and the batch generator: the deck text from a theme,
+# the physical card descriptions used as Flux prompts, and the card images with their renditions.
+
+
+# Call GPT-4 for the physical description of one card
+@traced("generate_physical_description")
+def generate_physical_description(client: openai.Client, arcana: Arcana, priority: Priority = Priority.BULK):
+    with span("generate_card.gpt_physical_description", card=arcana.name):
+        completion = chat_completion(
+            client,
+            priority=priority,
+            model="gpt-4o-2024-08-06",
+            messages=[
+                {"role": "system", "content": "Generate a short description of the physical tarot card that exemplifies the given arcana. Not more than 50 words."},
+                {"role": "user", "content": f"Arcana Name: {arcana.name} Description: {arcana.description}, Divinatory Meaning: {arcana.divinatory_meaning}, Reversed: {arcana.reversed}"},
+            ],
+            max_tokens=50,
+        )
+    description = completion.choices[0].message.content
+    description = description + f" The card says {arcana.name} on the card."
+    return description
+
+
+# Group card indices into description batches: the major arcana and one batch per minor arcana suit
+def description_batches(arcana_list: List[Arcana], num_major: int = 22):
+    batches = [list(range(min(num_major, len(arcana_list))))]
+    suits = {}
+    for idx in range(num_major, len(arcana_list)):
+        _, suit = parse_minor_name(arcana_list[idx].name)
+        # Names that don't parse fall back to the deck's suit order of 14 cards
+        suits.setdefault(suit.lower() if suit else (idx - num_major) // 14, []).append(idx)
+    return [batch for batch in batches + list(suits.values()) if batch]
+
+
+# Structured output that was cut off, refused or does not validate; the cards are then described one by one
+def _unusable_batch_output(exc: BaseException) -> bool:
+    # pydantic's ValidationError and JSON decode errors are ValueErrors
+    return isinstance(exc, ValueError) or type(exc).__name__ in ("LengthFinishReasonError", "ContentFilterFinishReasonError")
+
+
+# Generate the physical descriptions of several cards with one structured-output call.
+# Cards missing from the answer, or with an empty or overlong description, are generated one by one,
+# and so is the whole batch when the answer can't be used at all.
+@traced("generate_physical_descriptions")
+def generate_physical_descriptions(client: openai.Client, arcanas: List[Arcana]):
+    if len(arcanas) == 1:
+        return [generate_physical_description(client, arcanas[0])]
+
+    cards_prompt = "\n".join(
+        f"- Arcana Name: {arcana.name} Description: {arcana.description}, Divinatory Meaning: {arcana.divinatory_meaning}, Reversed: {arcana.reversed}"
+        for arcana in arcanas
+    )
+    with span("generate_card.gpt_physical_descriptions", cards=len(arcanas)):
+        try:
+            completion = parse_chat_completion(
+                client,
+                priority=Priority.BULK,
+                model="gpt-4o-2024-08-06",
+                messages=[
+                    {"role": "system", "content": "For each given arcana, generate a short description of the physical tarot card that exemplifies it. Not more than 50 words per card. Use the exact arcana names."},
+                    {"role": "user", "content": cards_prompt},
+                ],
+                # Up to 50 words of description plus the JSON keys and the card name per card
+                max_tokens=120 * len(arcanas),
+                response_format=PhysicalDescriptionBatch,
+            )
+            batch = completion.choices[0].message.parsed
+        except Exception as e:
+            if not _unusable_batch_output(e):
+                raise
+            batch = None
+    by_name = {card.name.strip().lower(): card.physical_description.strip() for card in (batch.cards if batch else [])}
+
+    descriptions = []
+    for arcana in arcanas:
+        description = by_name.get(arcana.name.strip().lower())
+        if not description or len(description.split()) > 60:
+            descriptions.append(generate_physical_description(client, arcana))
+        else:
+            descriptions.append(description + f" The card says {arcana.name} on the card.")
+    return descriptions
+
+
+# Render the card image at the given tier; renditions are only baked for final-quality images.
+# A seed other than the default renders a different take of the same description.
+@traced("generate_card_image")
+def generate_card_image(description: str, tier: str = "final", priority: Priority = Priority.BULK, seed: Optional[int] = None):
+    with span("generate_card.flux_inference", tier=tier):
+        response = flux_inference(description, priority=priority, tier=tier, seed=seed)
+
+    with span("generate_card.base64_encode", bytes=len(response)):
+        image_base64 = base64.b64encode(response).decode("utf-8")
+
+    # Bake the downscaled renditions into the card right away so no page has to resize it later
+    renditions = make_renditions(response) if tier == "final" else {}
+
+    return image_base64, renditions
+
+
+# Generate the physical descriptions, previews and final images of the given cards, yielding
+# (stage, card index, result, error) events as they happen, with stage "description", "preview" or "final".
+# Batches of card indices are described with one call each, and a card's preview starts as soon as its
+# description lands. Final renders start only once every preview is done: a running final render can't be
+# preempted, so finals started earlier would hold the Flux slots the previews wait for.
+def generate_card_images(client: openai.Client, arcana_list: List[Arcana], batches: Iterable[List[int]],
+                         preview_workers: int = 4, final_workers: int = 4):
+    descriptions = {}
+    description_executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix="card-descriptions")
+    preview_executor = ThreadPoolExecutor(max_workers=preview_workers, thread_name_prefix="card-previews")
+    final_executor = ThreadPoolExecutor(max_workers=final_workers, thread_name_prefix="card-finals")
+    try:
+        pending = {
+            submit_in_context(description_executor, generate_physical_descriptions, client, [arcana_list[idx] for idx in batch]): ("description", batch)
+            for batch in batches if batch
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, target = pending.pop(future)
+                if stage == "preview":
+                    yield stage, target, *_outcome(future)
+                    continue
+                batch_descriptions, error = _outcome(future)
+                if error is not None:
+                    for idx in target:
+                        yield stage, idx, None, error
+                    continue
+                for idx, description in zip(target, batch_descriptions):
+                    descriptions[idx] = description
+                    yield stage, idx, description, None
+                    preview = submit_in_context(preview_executor, generate_card_image, description, "preview", Priority.INTERACTIVE)
+                    pending[preview] = ("preview", idx)
+
+        finals = {
+            submit_in_context(final_executor, generate_card_image, description, "final", Priority.BULK): idx
+            for idx, description in descriptions.items()
+        }
+        for future in as_completed(finals):
+            yield "final", finals[future], *_outcome(future)
+    finally:
+        for executor in (description_executor, preview_executor, final_executor):
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _outcome(future):
+    try:
+        return future.result(), None
+    except Exception as e:
+        return None, e
+
+
+@traced("generate_card")
+def generate_card(client: openai.Client, arcana: Arcana):
+    description = generate_physical_description(client, arcana)
+    image_base64, renditions = generate_card_image(description)
+    return description, image_base64, renditions
+
+
+@traced("generate_deck")
+def generate_deck(client: openai.Client, theme: str, priority: Priority = Priority.INTERACTIVE):
+    completion = parse_chat_completion(
+        client,
+        priority=priority,
+        model="gpt-4o-2024-08-06",
+        messages=[
+            {"role": "system", "content": "Generate a custom tarot deck based on the theme provided. Remember to include 22 major and 56 minor arcana. The minor arcana should follow four custom suits. Each suit should have an Ace, the Two, the Three, the Four, the Five, the Six, the Seven, the Eight, the Nine, the Ten, the Page, the Knight, the Queen, and the King of the suit."},
+            {"role": "user", "content": f"Theme: {theme}"},
+        ],
+        response_format=TarotDeck
+    )
+    return completion.choices[0].message.parsed
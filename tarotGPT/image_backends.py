@@ -0,0 +1,251 @@
+import contextvars
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from tarotGPT.imaging import DEFAULT_TIER, standin_inference
+from tarotGPT.startup_profile import lazy_import
+from tarotGPT.tracing import span
+
+# Image backends and a latency-aware router over them.
+#
+# Every backend renders a card from a prompt and returns the JPEG bytes. The router sends each request
+# to the backend with the lowest median latency, and if the call is still running after that backend's
+# p95 latency it sends a hedged duplicate to the next best backend and returns whichever finishes first.
+# A failed call fails over to the next backend. With a single backend there is no hedging, since a
+# duplicate would only add load to the pool that is already slow.
+#
+# TAROTGPT_IMAGE_BACKENDS lists the backends in order of preference, e.g. "modal,web" (default "modal"):
+#   modal    the deployed Model class, called with .inference.remote
+#   web      the Model.web_inference HTTP endpoint at TAROTGPT_FLUX_WEB_URL
+#   standin  the local CPU stand-in pipeline
+# TAROTGPT_IMAGE_BACKEND=standin keeps selecting the stand-in alone.
+
+
+class ImageBackend:
+    name = "backend"
+
+    def infer(self, prompt: str, tier: str = DEFAULT_TIER, n_steps: Optional[int] = None, **kwargs) -> bytes:
+        raise NotImplementedError
+
+
+class ModalBackend(ImageBackend):
+    name = "modal"
+
+    # cls: a Model class of a running app to call directly instead of looking up the deployed one
+    def __init__(self, app_name: str = "tarotGPT", class_name: str = "Model", cls=None):
+        self.app_name = app_name
+        self.class_name = class_name
+        self.cls = cls
+
+    def infer(self, prompt, tier=DEFAULT_TIER, n_steps=None, **kwargs):
+        cls = self.cls
+        if cls is None:
+            modal = lazy_import("modal")
+            cls = modal.Cls.lookup(self.app_name, self.class_name)
+        obj = cls()  # You can pass any constructor arguments here
+        if n_steps is not None:
+            kwargs["n_steps"] = n_steps
+        return obj.inference.remote(prompt=prompt, tier=tier, **kwargs)
+
+
+class WebEndpointBackend(ImageBackend):
+    name = "web"
+
+    def __init__(self, url: str, timeout: float = 600.0):
+        self.url = url
+        self.timeout = timeout
+
+    def infer(self, prompt, tier=DEFAULT_TIER, n_steps=None, seed=None, **kwargs):
+        params = {"prompt": prompt, "tier": tier}
+        if n_steps is not None:
+            params["n_steps"] = n_steps
+        if seed is not None:
+            params["seed"] = seed
+        with urllib.request.urlopen(f"{self.url}?{urllib.parse.urlencode(params)}", timeout=self.timeout) as response:
+            return response.read()
+
+
+class StandInBackend(ImageBackend):
+    name = "standin"
+
+    def infer(self, prompt, tier=DEFAULT_TIER, n_steps=None, seed=None, **kwargs):
+        return standin_inference(prompt, tier=tier, n_steps=n_steps, seed=seed)
+
+
+class LatencyTracker:
+    # Latencies of the most recent successful calls of one backend
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.calls += 1
+            self.consecutive_errors = 0
+            self._samples.append(seconds)
+
+    def record_error(self):
+        with self._lock:
+            self.calls += 1
+            self.errors += 1
+            self.consecutive_errors += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._samples)
+
+
+class ImageRouter:
+    # min_samples: calls a backend needs before its p95 is trusted; until then hedge_after (if set) is used
+    def __init__(self, backends: List[ImageBackend], hedge_percentile: float = 0.95, min_samples: int = 10,
+                 hedge_after: Optional[float] = None, max_workers: int = 16):
+        if not backends:
+            raise ValueError("ImageRouter needs at least one backend")
+        self.backends = backends
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.hedge_after = hedge_after
+        self.latency: Dict[str, LatencyTracker] = {backend.name: LatencyTracker() for backend in backends}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-router")
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    # Backends by expected latency; backends without samples keep their configured order at the front,
+    # and backends failing repeatedly go to the back
+    def ranked(self) -> List[ImageBackend]:
+        def expected(indexed):
+            idx, backend = indexed
+            tracker = self.latency[backend.name]
+            median = tracker.percentile(0.5)
+            return (tracker.consecutive_errors >= 3, median is not None, median or 0.0, idx)
+
+        return [backend for _, backend in sorted(enumerate(self.backends), key=expected)]
+
+    def _hedge_delay(self, backend: ImageBackend) -> Optional[float]:
+        tracker = self.latency[backend.name]
+        if len(tracker) >= self.min_samples:
+            return tracker.percentile(self.hedge_percentile)
+        return self.hedge_after
+
+    def _call(self, backend: ImageBackend, prompt, **kwargs) -> bytes:
+        started = time.perf_counter()
+        try:
+            with span("image_router.backend", backend=backend.name):
+                result = backend.infer(prompt, **kwargs)
+        except Exception:
+            self.latency[backend.name].record_error()
+            raise
+        self.latency[backend.name].record(time.perf_counter() - started)
+        return result
+
+    def _submit(self, backend: ImageBackend, prompt, **kwargs):
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, self._call, backend, prompt, **kwargs)
+
+    def infer(self, prompt: str, tier: str = DEFAULT_TIER, n_steps: Optional[int] = None, **kwargs) -> bytes:
+        primary, *fallbacks = self.ranked()
+        pending = {self._submit(primary, prompt, tier=tier, n_steps=n_steps, **kwargs)}
+        hedge_delay = self._hedge_delay(primary) if fallbacks else None
+        hedge_future = None
+
+        # First successful result wins; a slower call finishes in the background and still records its latency
+        first_error = None
+        while pending:
+            timeout = hedge_delay if hedge_future is None and fallbacks else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                backend = fallbacks.pop(0)
+                with self._lock:
+                    self.hedges += 1
+                with span("image_router.hedge", primary=primary.name, hedge=backend.name):
+                    hedge_future = self._submit(backend, prompt, tier=tier, n_steps=n_steps, **kwargs)
+                pending.add(hedge_future)
+                continue
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge_future:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                first_error = first_error or future.exception()
+            # Fail over to the next backend unless another call is still running
+            if not pending and fallbacks:
+                backend = fallbacks.pop(0)
+                with self._lock:
+                    self.failovers += 1
+                with span("image_router.failover", backend=backend.name):
+                    pending.add(self._submit(backend, prompt, tier=tier, n_steps=n_steps, **kwargs))
+        raise first_error
+
+    def stats(self):
+        backends = {}
+        for backend in self.backends:
+            tracker = self.latency[backend.name]
+            backends[backend.name] = {
+                "calls": tracker.calls,
+                "errors": tracker.errors,
+                "p50_seconds": tracker.percentile(0.5),
+                "p95_seconds": tracker.percentile(0.95),
+            }
+        with self._lock:
+            return {"backends": backends, "hedges": self.hedges, "hedge_wins": self.hedge_wins, "failovers": self.failovers}
+
+
+def backends_from_env() -> List[ImageBackend]:
+    if os.environ.get("TAROTGPT_IMAGE_BACKEND") == "standin":
+        return [StandInBackend()]
+
+    backends = []
+    for name in os.environ.get("TAROTGPT_IMAGE_BACKENDS", "modal").split(","):
+        name = name.strip()
+        if name == "modal":
+            backends.append(ModalBackend())
+        elif name == "web":
+            url = os.environ.get("TAROTGPT_FLUX_WEB_URL")
+            if not url:
+                raise ValueError("The web image backend needs TAROTGPT_FLUX_WEB_URL")
+            backends.append(WebEndpointBackend(url))
+        elif name == "standin":
+            backends.append(StandInBackend())
+        elif name:
+            raise ValueError(f"Unknown image backend {name!r}, expected modal, web or standin")
+    return backends
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+# Process-wide router shared by all sessions, so latency statistics accumulate across them
+def get_image_router() -> ImageRouter:
+    global _router
+    with _router_lock:
+        if _router is None:
+            hedge_after = os.environ.get("TAROTGPT_HEDGE_AFTER")
+            _router = ImageRouter(backends_from_env(), hedge_after=float(hedge_after) if hedge_after else None)
+        return _router
+
+
+# Replace the process-wide router, e.g. to render on the Model of an app started with `modal run`
+def set_image_router(router: ImageRouter):
+    global _router
+    with _router_lock:
+        _router = router
@@ -0,0 +1,48 @@
+import os
+from io import BytesIO
+
+import streamlit as st
+
+from tarotGPT.debug_panel import debug_enabled
+from tarotGPT.startup_profile import lazy_import
+
+# Image delivery to the browser. show_image() hands encoded image bytes (or an image file path) to
+# st.image unchanged, so Streamlit serves the stored JPEG as-is instead of re-encoding a decoded PIL image,
+# usually as a much larger PNG, on every rerun. Identical bytes are served from the same media URL.
+#
+# Every page run counts the images and bytes it sends; with the debug panel enabled it also counts what
+# re-encoding the same images as PNG would have sent, for comparison.
+
+ACCOUNTING_KEY = "image_delivery"
+
+
+# Reset the per-run counters, called at the top of every page run
+def begin_image_accounting():
+    st.session_state[ACCOUNTING_KEY] = {"images": 0, "bytes": 0, "reencoded_png_bytes": 0}
+
+
+def _reencoded_png_size(data: bytes) -> int:
+    Image = lazy_import("PIL.Image")
+    byte_stream = BytesIO()
+    Image.open(BytesIO(data)).save(byte_stream, format="PNG")
+    return len(byte_stream.getvalue())
+
+
+# Show encoded image bytes or an image file without re-encoding; returns the bytes sent
+def show_image(image, caption=None, container=None, use_column_width=True):
+    if isinstance(image, str):
+        size = os.path.getsize(image)
+        png_size = size
+    else:
+        size = len(image)
+        png_size = None
+
+    accounting = st.session_state.get(ACCOUNTING_KEY)
+    if accounting is not None:
+        accounting["images"] += 1
+        accounting["bytes"] += size
+        if debug_enabled():
+            accounting["reencoded_png_bytes"] += png_size if png_size is not None else _reencoded_png_size(image)
+
+    (container or st).image(image, caption=caption, use_column_width=use_column_width)
+    return size
@@ -0,0 +1,275 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional
+
+from tarotGPT.tracing import span
+
+# Card rendering shared by the Flux Model container and the CPU stand-in.
+#
+# Two render tiers: a fast low-resolution preview so the whole deck shows up quickly,
+# and the full-quality final render that replaces it.
+TIERS = {
+    "preview": {"width": 384, "height": 512, "n_steps": 4},
+    "final": {"width": 768, "height": 1024, "n_steps": 24},
+}
+DEFAULT_TIER = "final"
+
+BASE_MODEL = "black-forest-labs/FLUX.1-dev"
+TAROT_LORA = "multimodalart/flux-tarot-v1"
+
+TRIGGER_WORD = "in the style of TOK a trtcrd, tarot style"
+SEED = 0
+LORA_SCALE = 0.95
+CFG_SCALE = 3.5
+
+
+# Full set of parameters a render depends on; a seed other than the default SEED gives another take of a card
+def render_params(tier: str = DEFAULT_TIER, n_steps: Optional[int] = None, seed: Optional[int] = None):
+    if tier not in TIERS:
+        raise ValueError(f"Unknown render tier {tier!r}, expected one of {sorted(TIERS)}")
+    params = dict(TIERS[tier], tier=tier, seed=SEED if seed is None else seed, lora_scale=LORA_SCALE, cfg_scale=CFG_SCALE)
+    if n_steps is not None:
+        params["n_steps"] = n_steps
+    return params
+
+
+# Cache key of a render: identical keys produce identical images
+def inference_key(prompt: str, tier: str = DEFAULT_TIER, n_steps: Optional[int] = None, seed: Optional[int] = None) -> str:
+    payload = json.dumps({"prompt": prompt, **render_params(tier, n_steps, seed)}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PromptEmbeddingCache:
+    # Bounded LRU cache of text-encoder outputs keyed by the full prompt text.
+    # encode_fn(text) returns the (prompt_embeds, pooled_prompt_embeds) pair passed to the pipeline.
+    def __init__(self, encode_fn, max_entries: int = 64):
+        self.encode_fn = encode_fn
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.encoder_seconds = 0.0
+
+    def get(self, text: str):
+        with self._lock:
+            if text in self._entries:
+                self._entries.move_to_end(text)
+                self.hits += 1
+                return self._entries[text]
+            self.misses += 1
+
+        started = time.perf_counter()
+        with span("prompt_embedding_cache.encode"):
+            embeddings = self.encode_fn(text)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.encoder_seconds += elapsed
+            self._entries[text] = embeddings
+            self._entries.move_to_end(text)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return embeddings
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "encoder_seconds": round(self.encoder_seconds, 3),
+                "encoder_seconds_per_miss": round(self.encoder_seconds / self.misses, 3) if self.misses else 0.0,
+            }
+
+
+# Encode a prompt with the Flux text encoders the same way the pipeline does internally
+def encode_flux_prompt(pipeline, text: str, device=None):
+    prompt_embeds, pooled_prompt_embeds, _ = pipeline.encode_prompt(
+        prompt=text, prompt_2=text, device=device, num_images_per_prompt=1, lora_scale=LORA_SCALE,
+    )
+    return prompt_embeds, pooled_prompt_embeds
+
+
+# Run a diffusers-style pipeline for one card and return the JPEG bytes stream.
+# With an embedding cache the text encoders only run for prompts not seen before.
+def render_card(pipeline, prompt: str, tier: str = DEFAULT_TIER, n_steps: Optional[int] = None, generator=None,
+                embedding_cache: Optional[PromptEmbeddingCache] = None):
+    params = render_params(tier, n_steps)
+
+    text = f"{prompt} {TRIGGER_WORD}"
+    if embedding_cache is not None:
+        prompt_embeds, pooled_prompt_embeds = embedding_cache.get(text)
+        prompt_kwargs = {"prompt_embeds": prompt_embeds, "pooled_prompt_embeds": pooled_prompt_embeds}
+    else:
+        prompt_kwargs = {"prompt": text}
+
+    with span("render_card.pipeline", tier=tier, n_steps=params["n_steps"], width=params["width"], height=params["height"]):
+        image = pipeline(
+            **prompt_kwargs,
+            num_inference_steps=params["n_steps"],
+            guidance_scale=params["cfg_scale"],
+            width=params["width"],
+            height=params["height"],
+            generator=generator,
+            joint_attention_kwargs={"scale": params["lora_scale"]},
+        ).images[0]
+
+    with span("render_card.jpeg_encode"):
+        byte_stream = io.BytesIO()
+        image.save(byte_stream, format="JPEG")
+
+    return byte_stream
+
+
+class StartupTimings:
+    # Durations of the phases of a container start, in the order they ran
+    def __init__(self):
+        self.started_at = time.time()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        with span(f"startup.{name}"):
+            yield
+        self.phases[name] = round(time.perf_counter() - started, 3)
+
+    def as_dict(self):
+        return {
+            "started_at": self.started_at,
+            "phases_seconds": dict(self.phases),
+            "total_seconds": round(sum(self.phases.values()), 3),
+        }
+
+
+# TAROTGPT_COMPILE=1 compiles the diffusion transformer at container start
+def compile_enabled() -> bool:
+    return os.environ.get("TAROTGPT_COMPILE") == "1"
+
+
+# Render tiers to warm up at container start, e.g. TAROTGPT_WARM_UP_TIERS=preview,final (default: none).
+# Compiled graphs are specialized per image size, so with compilation every tier in use should be warmed up.
+def warm_up_tiers() -> list:
+    tiers = [tier.strip() for tier in os.environ.get("TAROTGPT_WARM_UP_TIERS", "").split(",") if tier.strip()]
+    for tier in tiers:
+        render_params(tier)
+    return tiers
+
+
+# Load the base pipeline with the tarot LoRA, timing each phase; compile_fn(pipeline) optionally compiles it
+def load_card_pipeline(pipeline_cls, device, timings: StartupTimings, compile_fn: Optional[Callable] = None, **pretrained_kwargs):
+    with timings.phase("weights_load"):
+        pipeline = pipeline_cls.from_pretrained(BASE_MODEL, **pretrained_kwargs)
+    with timings.phase("device_transfer"):
+        pipeline = pipeline.to(device)
+    with timings.phase("lora_load"):
+        pipeline.load_lora_weights(TAROT_LORA)
+    if compile_fn is not None:
+        with timings.phase("compile"):
+            compile_fn(pipeline)
+    return pipeline
+
+
+WARM_UP_PROMPT = "A tarot card warming up the pipeline"
+
+
+# Run one render per tier so the first user request doesn't pay for kernel selection and compilation
+def warm_up(render: Callable, tiers: Iterable[str], timings: StartupTimings):
+    for tier in tiers:
+        with timings.phase(f"warm_up_{tier}"):
+            render(WARM_UP_PROMPT, None, tier)
+
+
+class StandInPipeline:
+    # CPU stand-in for the Flux pipeline: draws a deterministic colour field per prompt,
+    # so the render flow can run without a GPU or model weights.
+    # Its tiny "text encoder" is a SHA-256 of the prompt, and it counts how often it runs.
+    def __init__(self):
+        self.calls = 0
+        self.encoder_calls = 0
+        self.lora = None
+
+    # Same loading interface as the diffusers pipeline, so the container start flow runs on the CPU
+    @classmethod
+    def from_pretrained(cls, name, **kwargs):
+        return cls()
+
+    def to(self, device):
+        return self
+
+    def load_lora_weights(self, name):
+        self.lora = name
+
+    def encode_prompt(self, prompt, prompt_2=None, device=None, num_images_per_prompt=1, lora_scale=None, **kwargs):
+        self.encoder_calls += 1
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        return digest, digest[:8], None
+
+    # generator is the render seed here
+    def __call__(self, num_inference_steps, width, height, prompt=None, prompt_embeds=None, generator=None, **kwargs):
+        from PIL import Image, ImageDraw
+
+        self.calls += 1
+        digest = prompt_embeds if prompt_embeds is not None else self.encode_prompt(prompt)[0]
+        if generator not in (None, SEED):
+            digest = hashlib.sha256(digest + str(generator).encode("utf-8")).digest()
+        image = Image.new("RGB", (width, height), tuple(digest[:3]))
+        draw = ImageDraw.Draw(image)
+        draw.rectangle([width // 10, height // 10, width - width // 10, height - height // 10], outline=tuple(digest[3:6]), width=4)
+        draw.text((width // 8, height // 8), f"{num_inference_steps} steps", fill=(255, 255, 255))
+
+        class Output:
+            images = [image]
+
+        return Output()
+
+
+_standin_pipeline = None
+_standin_embedding_cache = None
+_standin_startup = None
+_standin_lock = threading.Lock()
+
+
+def _standin_render(prompt, n_steps, tier, seed=None):
+    return render_card(
+        _standin_pipeline, prompt, tier=tier, n_steps=n_steps, generator=seed, embedding_cache=_standin_embedding_cache
+    )
+
+
+# Start the stand-in the same way Model.enter starts the Flux pipeline, including the optional warm-up
+def _start_standin():
+    global _standin_pipeline, _standin_embedding_cache, _standin_startup
+    timings = StartupTimings()
+    _standin_pipeline = load_card_pipeline(StandInPipeline, "cpu", timings)
+    _standin_embedding_cache = PromptEmbeddingCache(lambda text: encode_flux_prompt(_standin_pipeline, text))
+    warm_up(_standin_render, warm_up_tiers(), timings)
+    _standin_startup = timings
+
+
+# Render a card on the CPU stand-in, returns the JPEG bytes
+def standin_inference(prompt: str, tier: str = DEFAULT_TIER, n_steps: Optional[int] = None, seed: Optional[int] = None,
+                      **kwargs) -> bytes:
+    with _standin_lock:
+        if _standin_pipeline is None:
+            _start_standin()
+    return _standin_render(prompt, n_steps, tier, seed).getvalue()
+
+
+def standin_stats():
+    if _standin_embedding_cache is None:
+        return {}
+    return {
+        "startup": _standin_startup.as_dict(),
+        "embedding_cache": _standin_embedding_cache.stats(),
+        "pipeline_calls": _standin_pipeline.calls,
+    }
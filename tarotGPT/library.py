@@ -0,0 +1,319 @@
+import base64
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from tarotGPT.deck_index import card_content_hash, deck_content_hash, parse_minor_name
+from tarotGPT.models import ImagedArcana, ImagedTarotDeck
+from tarotGPT.renditions import RENDITIONS, card_image_bytes, pick_rendition
+
+# Local deck library: an SQLite catalog of decks, cards and themes plus a content-hash-addressed
+# blob store for card images, so an image shared by several decks is stored once.
+#
+#   <root>/catalog.sqlite3
+#   <root>/blobs/<sha256[:2]>/<sha256>
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS themes (
+    theme_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS decks (
+    deck_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    theme_id INTEGER REFERENCES themes(theme_id),
+    content_hash TEXT NOT NULL UNIQUE,
+    source TEXT,
+    num_major INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cards (
+    deck_id TEXT NOT NULL REFERENCES decks(deck_id) ON DELETE CASCADE,
+    card_id INTEGER NOT NULL,
+    arcana TEXT NOT NULL,
+    name TEXT NOT NULL,
+    suit TEXT,
+    rank TEXT,
+    description TEXT NOT NULL,
+    divinatory_meaning TEXT NOT NULL,
+    reversed TEXT NOT NULL,
+    physical_description TEXT NOT NULL,
+    image_hash TEXT NOT NULL,
+    PRIMARY KEY (deck_id, card_id)
+);
+CREATE TABLE IF NOT EXISTS card_renditions (
+    deck_id TEXT NOT NULL,
+    card_id INTEGER NOT NULL,
+    rendition TEXT NOT NULL,
+    blob_hash TEXT NOT NULL,
+    PRIMARY KEY (deck_id, card_id, rendition),
+    FOREIGN KEY (deck_id, card_id) REFERENCES cards(deck_id, card_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS decks_name ON decks(name);
+CREATE INDEX IF NOT EXISTS decks_theme ON decks(theme_id);
+CREATE INDEX IF NOT EXISTS cards_name ON cards(name);
+CREATE INDEX IF NOT EXISTS cards_suit ON cards(deck_id, suit);
+CREATE INDEX IF NOT EXISTS cards_arcana ON cards(deck_id, arcana);
+"""
+
+
+# Raised when an edit would make a deck identical to another stored deck, whose ID it carries
+class DuplicateDeckError(ValueError):
+    def __init__(self, deck_id: str):
+        super().__init__(f"The edited deck is identical to library deck {deck_id}")
+        self.deck_id = deck_id
+
+
+class BlobStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, blob_hash: str) -> str:
+        return os.path.join(self.directory, blob_hash[:2], blob_hash)
+
+    def put(self, data: bytes) -> str:
+        blob_hash = hashlib.sha256(data).hexdigest()
+        path = self._path(blob_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return blob_hash
+
+    def get(self, blob_hash: str) -> bytes:
+        with open(self._path(blob_hash), "rb") as f:
+            return f.read()
+
+    def get_base64(self, blob_hash: str) -> str:
+        return base64.b64encode(self.get(blob_hash)).decode("utf-8")
+
+
+class DeckLibrary:
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.environ.get("TAROTGPT_LIBRARY_DIR", "deck_library")
+        os.makedirs(self.root, exist_ok=True)
+        self.db_path = os.path.join(self.root, "catalog.sqlite3")
+        self.blobs = BlobStore(os.path.join(self.root, "blobs"))
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    # One short-lived connection per operation keeps the library safe to share between Streamlit sessions
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA foreign_keys = ON")
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _theme_id(self, connection, theme: Optional[str]) -> Optional[int]:
+        if not theme:
+            return None
+        connection.execute("INSERT OR IGNORE INTO themes (name) VALUES (?)", (theme,))
+        return connection.execute("SELECT theme_id FROM themes WHERE name = ?", (theme,)).fetchone()["theme_id"]
+
+    # Store a deck and return its ID; adding the same deck content twice returns the existing ID
+    def add_deck(self, deck: ImagedTarotDeck, name: str, theme: Optional[str] = None, source: Optional[str] = None) -> str:
+        content_hash = deck_content_hash(deck)
+        existing = self.find_deck_by_hash(content_hash)
+        if existing is not None:
+            return existing
+
+        # Not derived from the content hash: the content of a stored deck changes when a card is replaced
+        deck_id = uuid.uuid4().hex[:16]
+        cards = list(deck.major_arcana) + list(deck.minor_arcana)
+        card_rows = []
+        rendition_rows = []
+        for card_id, card in enumerate(cards):
+            is_major = card_id < len(deck.major_arcana)
+            rank, suit = (None, None) if is_major else parse_minor_name(card.name)
+            image_hash = self.blobs.put(base64.b64decode(card.image_base64))
+            card_rows.append((
+                deck_id, card_id, "major" if is_major else "minor", card.name, suit, rank,
+                card.description, card.divinatory_meaning, card.reversed, card.physical_description, image_hash,
+            ))
+            for rendition, rendition_base64 in card.renditions.items():
+                rendition_rows.append((deck_id, card_id, rendition, self.blobs.put(base64.b64decode(rendition_base64))))
+
+        try:
+            self._insert_deck(deck_id, name, theme, content_hash, source, len(deck.major_arcana), card_rows, rendition_rows)
+        except sqlite3.IntegrityError:
+            # Another session stored the same deck in the meantime
+            return self.find_deck_by_hash(content_hash)
+        return deck_id
+
+    def _insert_deck(self, deck_id, name, theme, content_hash, source, num_major, card_rows, rendition_rows):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO decks (deck_id, name, theme_id, content_hash, source, num_major, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (deck_id, name, self._theme_id(connection, theme), content_hash, source, num_major, time.time()),
+            )
+            connection.executemany("INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", card_rows)
+            connection.executemany("INSERT INTO card_renditions VALUES (?, ?, ?, ?)", rendition_rows)
+
+    # Replace one card of a stored deck (text, image and renditions) and return the deck's new content hash.
+    # Blobs of the replaced image stay in the blob store, they may be shared with other decks. Raises
+    # DuplicateDeckError, leaving the deck unchanged, if the edited deck is identical to another stored deck.
+    def replace_card(self, deck_id: str, card_id: int, card: ImagedArcana) -> str:
+        deck = self.load_deck(deck_id)
+        if deck is None:
+            raise KeyError(f"Deck {deck_id} was not found in the library")
+        cards = list(deck.major_arcana) + list(deck.minor_arcana)
+        if not 0 <= card_id < len(cards):
+            raise IndexError(f"Deck {deck_id} has no card {card_id}")
+        cards[card_id] = card
+        num_major = len(deck.major_arcana)
+        content_hash = deck_content_hash(ImagedTarotDeck(major_arcana=cards[:num_major], minor_arcana=cards[num_major:]))
+        existing = self.find_deck_by_hash(content_hash)
+        if existing not in (None, deck_id):
+            raise DuplicateDeckError(existing)
+
+        rank, suit = (None, None) if card_id < num_major else parse_minor_name(card.name)
+        image_hash = self.blobs.put(base64.b64decode(card.image_base64))
+        rendition_rows = [
+            (deck_id, card_id, rendition, self.blobs.put(base64.b64decode(rendition_base64)))
+            for rendition, rendition_base64 in card.renditions.items()
+        ]
+        try:
+            self._update_card(deck_id, card_id, card, suit, rank, image_hash, rendition_rows, content_hash)
+        except sqlite3.IntegrityError:
+            # Another session stored a deck with the same content in the meantime
+            raise DuplicateDeckError(self.find_deck_by_hash(content_hash))
+        return content_hash
+
+    def _update_card(self, deck_id, card_id, card, suit, rank, image_hash, rendition_rows, content_hash):
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE cards SET name = ?, suit = ?, rank = ?, description = ?, divinatory_meaning = ?, reversed = ?, "
+                "physical_description = ?, image_hash = ? WHERE deck_id = ? AND card_id = ?",
+                (card.name, suit, rank, card.description, card.divinatory_meaning, card.reversed,
+                 card.physical_description, image_hash, deck_id, card_id),
+            )
+            connection.execute("DELETE FROM card_renditions WHERE deck_id = ? AND card_id = ?", (deck_id, card_id))
+            connection.executemany("INSERT INTO card_renditions VALUES (?, ?, ?, ?)", rendition_rows)
+            connection.execute("UPDATE decks SET content_hash = ? WHERE deck_id = ?", (content_hash, deck_id))
+
+    def find_deck_by_hash(self, content_hash: str) -> Optional[str]:
+        with self._connect() as connection:
+            row = connection.execute("SELECT deck_id FROM decks WHERE content_hash = ?", (content_hash,)).fetchone()
+        return row["deck_id"] if row else None
+
+    def list_decks(self, theme: Optional[str] = None) -> List[Dict]:
+        query = (
+            "SELECT decks.deck_id, decks.name, themes.name AS theme, decks.content_hash, decks.source, decks.created_at "
+            "FROM decks LEFT JOIN themes ON decks.theme_id = themes.theme_id"
+        )
+        params = ()
+        if theme:
+            query += " WHERE themes.name = ?"
+            params = (theme,)
+        with self._connect() as connection:
+            rows = connection.execute(query + " ORDER BY decks.created_at DESC", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_deck_info(self, deck_id: str) -> Optional[Dict]:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT decks.*, themes.name AS theme FROM decks LEFT JOIN themes ON decks.theme_id = themes.theme_id "
+                "WHERE deck_id = ?",
+                (deck_id,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def _card_from_row(self, row, with_images: bool, card_renditions: Dict[str, str]) -> ImagedArcana:
+        return ImagedArcana(
+            name=row["name"],
+            description=row["description"],
+            divinatory_meaning=row["divinatory_meaning"],
+            reversed=row["reversed"],
+            physical_description=row["physical_description"],
+            image_base64=self.blobs.get_base64(row["image_hash"]) if with_images else "",
+            renditions=card_renditions,
+        )
+
+    # Load selected cards of a deck; without images only the indexed text columns are read
+    def load_cards(self, deck_id: str, card_ids: Optional[Iterable[int]] = None, arcana: Optional[str] = None,
+                   suit: Optional[str] = None, with_images: bool = True, renditions: Iterable[str] = ()) -> List[ImagedArcana]:
+        query = "SELECT * FROM cards WHERE deck_id = ?"
+        params = [deck_id]
+        if card_ids is not None:
+            card_ids = list(card_ids)
+            query += f" AND card_id IN ({', '.join('?' for _ in card_ids)})"
+            params.extend(card_ids)
+        if arcana is not None:
+            query += " AND arcana = ?"
+            params.append(arcana)
+        if suit is not None:
+            query += " AND suit = ?"
+            params.append(suit)
+
+        renditions = list(renditions)
+        rendition_hashes = {}
+        with self._connect() as connection:
+            rows = connection.execute(query + " ORDER BY card_id", params).fetchall()
+            if renditions and rows:
+                rendition_query = (
+                    f"SELECT card_id, rendition, blob_hash FROM card_renditions WHERE deck_id = ? "
+                    f"AND rendition IN ({', '.join('?' for _ in renditions)}) "
+                    f"AND card_id IN ({', '.join('?' for _ in rows)})"
+                )
+                for rendition_row in connection.execute(rendition_query, (deck_id, *renditions, *(row["card_id"] for row in rows))):
+                    rendition_hashes.setdefault(rendition_row["card_id"], {})[rendition_row["rendition"]] = rendition_row["blob_hash"]
+
+        return [
+            self._card_from_row(
+                row,
+                with_images,
+                {name: self.blobs.get_base64(blob_hash) for name, blob_hash in rendition_hashes.get(row["card_id"], {}).items()},
+            )
+            for row in rows
+        ]
+
+    def load_card(self, deck_id: str, card_id: int, with_images: bool = True, renditions: Iterable[str] = ()) -> Optional[ImagedArcana]:
+        cards = self.load_cards(deck_id, card_ids=[card_id], with_images=with_images, renditions=renditions)
+        return cards[0] if cards else None
+
+    # Encoded image of one card covering width x height: a stored rendition, or else the original
+    # (resized on the fly to a standard rendition size), without loading the rest of the deck
+    def load_card_image(self, deck_id: str, card_id: int, width: Optional[int] = None, height: Optional[int] = None) -> Optional[bytes]:
+        card = self.load_card(deck_id, card_id, with_images=False, renditions=RENDITIONS)
+        if card is not None and (pick_rendition(card, width, height) is None or not (width or height)):
+            card = self.load_card(deck_id, card_id, renditions=RENDITIONS)
+        return card_image_bytes(card, width, height) if card is not None else None
+
+    # card_content_hash of every card in deck order, computed from the catalog without reading any image
+    def card_hashes(self, deck_id: str) -> List[str]:
+        with self._connect() as connection:
+            rows = connection.execute("SELECT * FROM cards WHERE deck_id = ? ORDER BY card_id", (deck_id,)).fetchall()
+        return [card_content_hash(self._card_from_row(row, False, {}), image_hash=row["image_hash"]) for row in rows]
+
+    def load_deck(self, deck_id: str, with_images: bool = True, renditions: Iterable[str] = ()) -> Optional[ImagedTarotDeck]:
+        info = self.get_deck_info(deck_id)
+        if info is None:
+            return None
+        cards = self.load_cards(deck_id, with_images=with_images, renditions=renditions)
+        return ImagedTarotDeck(major_arcana=cards[:info["num_major"]], minor_arcana=cards[info["num_major"]:])
+
+
+_library = None
+_library_lock = threading.Lock()
+
+
+# Process-wide library shared by all pages and sessions
+def get_library() -> DeckLibrary:
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = DeckLibrary()
+        return _library
@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List
+
+# Define Pydantic models for Tarot Deck, shared by all pages
+class Arcana(BaseModel):
+    name: str = Field(..., description="The name of the tarot arcana")
+    description: str = Field(..., description="The description of the tarot arcana")
+    divinatory_meaning: str = Field(..., description="The divinatory meaning of the tarot arcana")
+    reversed: str = Field(..., description="The reversed divinatory meaning of the tarot arcana")
+
+class TarotDeck(BaseModel):
+    major_arcana: List[Arcana] = Field(..., description="The 22 Major Arcana of a Tarot Deck")
+    minor_arcana: List[Arcana] = Field(..., description="The 56 Minor Arcana of a Tarot Deck")
+
+class ImagedArcana(Arcana):
+    physical_description: str = Field(..., description="The physical description of the tarot card")
+    image_base64: str = Field(..., description="The base64 encoded image of the tarot card")
+    renditions: Dict[str, str] = Field(default_factory=dict, description="Pre-encoded base64 JPEG renditions of the card image by rendition name")
+
+class ImagedTarotDeck(BaseModel):
+    major_arcana: List[ImagedArcana] = Field(..., description="The 22 Major Arcana of a Tarot Deck")
+    minor_arcana: List[ImagedArcana] = Field(..., description="The 56 Minor Arcana of a Tarot Deck")
+
+class PhysicalDescription(BaseModel):
+    name: str = Field(..., description="The exact name of the tarot arcana")
+    physical_description: str = Field(..., description="Short description of the physical tarot card, not more than 50 words")
+
+class PhysicalDescriptionBatch(BaseModel):
+    cards: List[PhysicalDescription] = Field(..., description="One physical description per given arcana, in the given order")
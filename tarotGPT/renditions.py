@@ -0,0 +1,128 @@
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Optional
+
+from tarotGPT.startup_profile import lazy_import
+from tarotGPT.tracing import span
+
+# Fixed set of card image renditions baked into a deck when its images are generated.
+# Flux renders cards at 768x1024; every page picks the smallest rendition that covers the size it draws,
+# and larger sizes (e.g. the PDF pages) are resized from the original once per export.
+RENDITIONS = {
+    "thumbnail": (192, 256),  # Keltic Cross spread, Major and Minor Arcana grids, gallery tiles
+    "preview": (576, 768),  # full column width card views
+}
+# The quality Flux outputs are saved with (PIL's default); re-encoding any higher only adds bytes
+RENDITION_JPEG_QUALITY = 75
+
+
+def _encode_jpeg(image) -> bytes:
+    byte_stream = BytesIO()
+    image.convert("RGB").save(byte_stream, format="JPEG", quality=RENDITION_JPEG_QUALITY, optimize=True)
+    return byte_stream.getvalue()
+
+
+# Produce the renditions of a freshly generated card image, as base64 JPEG strings. Renditions that would
+# not be smaller than the original, in pixels or in bytes, are left out; pages then use the original.
+def make_renditions(image_bytes: bytes) -> Dict[str, str]:
+    Image = lazy_import("PIL.Image")
+    with span("make_renditions"):
+        image = Image.open(BytesIO(image_bytes))
+        image.load()
+        renditions = {}
+        for name, (width, height) in RENDITIONS.items():
+            if width >= image.width or height >= image.height:
+                continue
+            encoded = _encode_jpeg(image.resize((width, height), Image.Resampling.LANCZOS))
+            if len(encoded) < len(image_bytes):
+                renditions[name] = base64.b64encode(encoded).decode("utf-8")
+        return renditions
+
+
+# Name of the smallest rendition covering width x height, or None when only the original is large enough
+def pick_rendition(card, width: Optional[int] = None, height: Optional[int] = None) -> Optional[str]:
+    available = getattr(card, "renditions", None) or {}
+    for name, (rendition_width, rendition_height) in sorted(RENDITIONS.items(), key=lambda item: item[1][0]):
+        if name not in available:
+            continue
+        if (width is None or rendition_width >= width) and (height is None or rendition_height >= height):
+            return name
+    return None
+
+
+# Encoded bytes of the smallest stored image covering width x height. Decks stored without renditions
+# (e.g. older decks and Gists) get the standard rendition sizes made on the fly, so pages still only send
+# thumbnails for thumbnails; other sizes fall back to the original.
+def card_image_bytes(card, width: Optional[int] = None, height: Optional[int] = None) -> bytes:
+    name = pick_rendition(card, width, height) if width or height else None
+    if name:
+        return base64.b64decode(card.renditions[name])
+    original = base64.b64decode(card.image_base64)
+    if not (width or height):
+        return original
+    for rendition_width, rendition_height in sorted(RENDITIONS.values()):
+        if (width is None or rendition_width >= width) and (height is None or rendition_height >= height):
+            return resized_image_bytes(original, rendition_width, rendition_height)
+    return original
+
+
+# Decoded PIL image of the card at exactly width x height, resizing only when no rendition matches
+def card_pil_image(card, width: int, height: int):
+    Image = lazy_import("PIL.Image")
+    with span("card_pil_image.decode"):
+        image = Image.open(BytesIO(card_image_bytes(card, width, height)))
+        image.load()
+    if image.size != (width, height):
+        with span("card_pil_image.resize"):
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+    return image
+
+
+_derived_cache = OrderedDict()
+_derived_cache_lock = threading.Lock()
+DERIVED_CACHE_SIZE = 512
+
+
+# LRU cache of images derived from an encoded card image, keyed by its content and the variant
+def _cached_derived(image_bytes: bytes, variant: tuple, build) -> bytes:
+    key = (hashlib.sha256(image_bytes).digest(),) + variant
+    with _derived_cache_lock:
+        if key in _derived_cache:
+            _derived_cache.move_to_end(key)
+            return _derived_cache[key]
+
+    derived = build()
+
+    with _derived_cache_lock:
+        _derived_cache[key] = derived
+        while len(_derived_cache) > DERIVED_CACHE_SIZE:
+            _derived_cache.popitem(last=False)
+    return derived
+
+
+# Encoded width x height variant of an encoded card image, or the image itself when it is not larger
+def resized_image_bytes(image_bytes: bytes, width: int, height: int) -> bytes:
+    def build():
+        Image = lazy_import("PIL.Image")
+        with span("resized_image_bytes.encode", width=width, height=height):
+            image = Image.open(BytesIO(image_bytes))
+            if image.width <= width or image.height <= height:
+                return image_bytes
+            encoded = _encode_jpeg(image.resize((width, height), Image.Resampling.LANCZOS))
+            return encoded if len(encoded) < len(image_bytes) else image_bytes
+
+    return _cached_derived(image_bytes, ("resized", width, height), build)
+
+
+# Encoded upside-down variant of an encoded card image, cached by content. The pixel rotation is exact,
+# but the result is re-encoded as JPEG at the rendition quality, once per image.
+def reversed_image_bytes(image_bytes: bytes) -> bytes:
+    def build():
+        Image = lazy_import("PIL.Image")
+        with span("reversed_image_bytes.encode"):
+            return _encode_jpeg(Image.open(BytesIO(image_bytes)).transpose(Image.Transpose.ROTATE_180))
+
+    return _cached_derived(image_bytes, ("reversed",), build)
@@ -0,0 +1,299 @@
+import heapq
+import itertools
+import os
+import random
+import re
+import threading
+import time
+from enum import IntEnum
+from typing import Dict, Optional
+
+from tarotGPT.tracing import span
+
+# Rate-limit-aware scheduler shared by every GPT and Flux call made from this process.
+#
+# A call is admitted when it is the highest-priority waiter, the AIMD concurrency limit has room,
+# and the requests-per-minute / tokens-per-minute buckets hold enough budget. Rate-limit errors
+# halve the concurrency limit and pause all waiters for a jittered backoff, so a 429 does not turn
+# into an error storm; successes slowly grow the limit back towards max_concurrency.
+#
+# The bucket sizes start from configured defaults and are then set from the provider's own limits
+# (x-ratelimit-limit-*) and remaining budget (x-ratelimit-remaining-*) reported with every response,
+# so throughput follows the account's real ceiling. Explicit per-minute caps only ever lower it.
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # a user waiting on a reading
+    BULK = 1  # deck generation, cardbacks, batch jobs
+
+
+class RateLimitedError(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    # `updated` may lie in the future when the provider told us to wait for a reset
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+
+    # Seconds until `amount` is available (0 when it can be taken now)
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount and now >= self.updated:
+            return 0.0
+        return max(0.0, self.updated - now) + max(0.0, amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        self.level = min(self.capacity, self.level + delta)
+
+    # Resize to a per-minute limit reported by the provider; budget gained by a larger limit is usable right away
+    def set_limit(self, per_minute: float):
+        if per_minute <= 0 or per_minute == self.capacity:
+            return
+        self.level = max(0.0, min(per_minute, self.level + per_minute - self.capacity))
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+
+    # Provider reported how much budget is left until `reset_seconds` from now; it knows better than our estimate
+    def clamp(self, remaining: float, reset_seconds: Optional[float]):
+        self.level = min(self.capacity, remaining)
+        if reset_seconds and remaining <= 0:
+            self.updated = time.monotonic() + reset_seconds
+
+
+# Parse OpenAI-style reset durations such as "1s", "6m0s" or "20ms"
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    seconds = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        seconds += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return seconds
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def _headers(exc: BaseException):
+    return getattr(getattr(exc, "response", None), "headers", None) or {}
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    return isinstance(exc, RateLimitedError) or _status_code(exc) == 429 or type(exc).__name__ == "RateLimitError"
+
+
+# Transient failures worth retrying: throttling, server errors, timeouts and dropped connections
+def is_retryable_error(exc: BaseException) -> bool:
+    if is_rate_limit_error(exc):
+        return True
+    status = _status_code(exc)
+    if status is not None:
+        return status >= 500 or status == 408
+    return isinstance(exc, (TimeoutError, ConnectionError)) or type(exc).__name__ in (
+        "APIConnectionError", "APITimeoutError", "FunctionTimeoutError", "InternalFailure",
+    )
+
+
+class AdaptiveScheduler:
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        max_requests_per_minute: Optional[float] = None,
+        max_tokens_per_minute: Optional[float] = None,
+    ):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        # Operator caps applied on top of the limits the provider reports
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._stats = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0}
+
+    def _acquire(self, priority: Priority, tokens: float):
+        entry = (int(priority), next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._waiters[0] != entry or self._in_flight >= int(self.concurrency_limit):
+                        wait = None
+                    else:
+                        wait = max(
+                            self._paused_until - now,
+                            self.requests.wait_time(1, now),
+                            self.tokens.wait_time(tokens, now) if self.tokens else 0.0,
+                        )
+                    if wait == 0.0:
+                        self.requests.take(1)
+                        if self.tokens:
+                            self.tokens.take(tokens)
+                        self._in_flight += 1
+                        return
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def _release(self, succeeded: bool, rate_limited: bool, backoff: float = 0.0):
+        with self._cond:
+            self._in_flight -= 1
+            if rate_limited:
+                # Multiplicative decrease and a shared pause so waiters do not pile onto the limit
+                self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+                self._paused_until = max(self._paused_until, time.monotonic() + backoff)
+            elif succeeded:
+                # Additive increase of roughly one slot per window of successful calls
+                self.concurrency_limit = min(
+                    self.max_concurrency, self.concurrency_limit + 1.0 / max(self.concurrency_limit, 1.0)
+                )
+            self._cond.notify_all()
+
+    # Update the buckets from provider rate-limit headers (x-ratelimit-limit-*, x-ratelimit-remaining-*,
+    # x-ratelimit-reset-*)
+    def observe_headers(self, headers):
+        if not headers:
+            return
+        with self._cond:
+            self._observe_bucket(self.requests, headers, "requests", self.max_requests_per_minute)
+            if self.tokens:
+                self._observe_bucket(self.tokens, headers, "tokens", self.max_tokens_per_minute)
+            # A larger limit may admit waiters right away
+            self._cond.notify_all()
+
+    @staticmethod
+    def _observe_bucket(bucket: TokenBucket, headers, kind: str, cap: Optional[float]):
+        limit = headers.get(f"x-ratelimit-limit-{kind}")
+        if limit is not None:
+            bucket.set_limit(min(float(limit), cap) if cap else float(limit))
+        remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+        if remaining is not None:
+            bucket.clamp(float(remaining), parse_reset(headers.get(f"x-ratelimit-reset-{kind}")))
+
+    # Charge or refund the difference between estimated and actual token usage
+    def settle_tokens(self, estimated: float, actual: float):
+        if self.tokens:
+            with self._cond:
+                self.tokens.adjust(estimated - actual)
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        retry_after = parse_reset(_headers(exc).get("retry-after"))
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.base_delay)
+        # Full jitter exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def run(self, fn, *args, priority: Priority = Priority.BULK, tokens: float = 0, **kwargs):
+        attempt = 0
+        while True:
+            self._acquire(priority, tokens)
+            try:
+                with span(f"scheduler.{self.name}", priority=priority.name, attempt=attempt):
+                    result = fn(*args, **kwargs)
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                retry = is_retryable_error(e) and attempt < self.max_retries
+                backoff = self._backoff(attempt, e) if retry or rate_limited else 0.0
+                self._release(succeeded=False, rate_limited=rate_limited, backoff=backoff)
+                self.observe_headers(_headers(e))
+                with self._cond:
+                    self._stats["rate_limited"] += int(rate_limited)
+                    self._stats["retries"] += int(retry)
+                    self._stats["failures"] += int(not retry)
+                if not retry:
+                    raise
+                if not rate_limited:
+                    time.sleep(backoff)
+                attempt += 1
+                continue
+            self._release(succeeded=True, rate_limited=False)
+            with self._cond:
+                self._stats["calls"] += 1
+            return result
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return dict(
+                self._stats,
+                in_flight=self._in_flight,
+                concurrency_limit=round(self.concurrency_limit, 2),
+                waiting=len(self._waiters),
+                requests_per_minute=self.requests.capacity,
+                tokens_per_minute=self.tokens.capacity if self.tokens else None,
+            )
+
+
+_schedulers: Dict[str, AdaptiveScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def _default_scheduler(name: str) -> AdaptiveScheduler:
+    prefix = f"TAROTGPT_{name.upper()}_"
+    if name == "openai":
+        # Without TAROTGPT_OPENAI_RPM/TPM the tier-1 limits are only the starting point until the first
+        # response reports the account's limits; when set they cap what the provider reports
+        max_rpm = os.environ.get(prefix + "RPM")
+        max_tpm = os.environ.get(prefix + "TPM")
+        return AdaptiveScheduler(
+            name,
+            requests_per_minute=float(max_rpm or 500),
+            tokens_per_minute=float(max_tpm or 30000),
+            max_concurrency=int(os.environ.get(prefix + "CONCURRENCY", 8)),
+            max_requests_per_minute=float(max_rpm) if max_rpm else None,
+            max_tokens_per_minute=float(max_tpm) if max_tpm else None,
+        )
+    # The Flux model runs on at most two GPU containers
+    return AdaptiveScheduler(
+        name,
+        requests_per_minute=float(os.environ.get(prefix + "RPM", 120)),
+        max_concurrency=int(os.environ.get(prefix + "CONCURRENCY", 4)),
+        base_delay=2.0,
+    )
+
+
+# Process-wide scheduler per provider ("openai" or "flux"), shared by all Streamlit sessions
+def get_scheduler(name: str) -> AdaptiveScheduler:
+    with _schedulers_lock:
+        if name not in _schedulers:
+            _schedulers[name] = _default_scheduler(name)
+        return _schedulers[name]
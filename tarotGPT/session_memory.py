@@ -0,0 +1,104 @@
+import os
+import pickle
+import sys
+import tempfile
+import uuid
+import weakref
+
+import streamlit as st
+
+# Session-state size accounting. At the end of every script run a page calls account_session_state(),
+# which estimates the size of each session_state value and moves the large ones it declares spillable
+# to disk, leaving a small SpilledValue reference in the session. Read such values with session_value().
+#
+# Spilling is enabled by setting the per-value threshold TAROTGPT_SESSION_SPILL_BYTES (e.g. 8000000);
+# TAROTGPT_SPILL_DIR sets the spill directory (default: a tarotgpt_spill directory in the temp dir).
+
+SPILL_THRESHOLD_BYTES = int(os.environ.get("TAROTGPT_SESSION_SPILL_BYTES", 0))
+SPILL_DIR = os.environ.get("TAROTGPT_SPILL_DIR", os.path.join(tempfile.gettempdir(), "tarotgpt_spill"))
+
+REPORT_KEY = "session_memory"
+
+
+class SpilledValue:
+    # Reference to a session value pickled to disk; the file is removed once the session drops the reference
+    def __init__(self, value, size: int):
+        os.makedirs(SPILL_DIR, exist_ok=True)
+        self.path = os.path.join(SPILL_DIR, f"{uuid.uuid4().hex}.pickle")
+        self.size = size
+        self.type_name = type(value).__name__
+        with open(self.path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        weakref.finalize(self, _remove_file, self.path)
+
+    def load(self):
+        with open(self.path, "rb") as f:
+            return pickle.load(f)
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# Cheap recursive size estimate; counts payload bytes of strings, bytes, images and pydantic models
+def estimate_size(value, _seen=None) -> int:
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    if isinstance(value, SpilledValue):
+        return sys.getsizeof(value)
+    if isinstance(value, (str, bytes, bytearray)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(item, _seen) for item in value)
+    if hasattr(value, "model_dump") and hasattr(type(value), "model_fields"):
+        return sys.getsizeof(value) + sum(estimate_size(getattr(value, name), _seen) for name in type(value).model_fields)
+    if hasattr(value, "getbands") and hasattr(value, "size"):
+        # PIL image: decoded pixel buffer
+        width, height = value.size
+        return width * height * len(value.getbands())
+    return sys.getsizeof(value)
+
+
+# Read a session value, loading it back from disk if it was spilled
+def session_value(key: str, default=None):
+    value = st.session_state.get(key, default)
+    if isinstance(value, SpilledValue):
+        return value.load()
+    return value
+
+
+# Measure this session's state and spill large values of the given keys; the report is kept in the session
+def account_session_state(spillable=()):
+    threshold = SPILL_THRESHOLD_BYTES
+    sizes = {}
+    spilled = {}
+    for key in list(st.session_state.keys()):
+        if key == REPORT_KEY:
+            continue
+        value = st.session_state[key]
+        size = estimate_size(value)
+        if isinstance(value, SpilledValue):
+            spilled[key] = value.size
+        elif threshold and key in spillable and size > threshold:
+            st.session_state[key] = SpilledValue(value, size)
+            spilled[key] = size
+            size = estimate_size(st.session_state[key])
+        sizes[key] = size
+
+    report = {
+        "resident_bytes": sum(sizes.values()),
+        "spilled_bytes": sum(spilled.values()),
+        "largest_keys": dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True)[:5]),
+        "spilled_keys": spilled,
+    }
+    st.session_state[REPORT_KEY] = report
+    return report
@@ -0,0 +1,69 @@
+import json
+import os
+import re
+import time
+import uuid
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+# Persisted reading snapshots: everything needed to show a finished reading again
+# (spread image, interpretations, summary) without any LLM or image work.
+
+
+class SnapshotCard(BaseModel):
+    card_id: int = Field(..., description="The card ID in the deck index")
+    name: str = Field(..., description="The name of the drawn card")
+    reversed: bool = Field(..., description="Whether the card was drawn reversed")
+    position: str = Field(..., description="The Keltic Cross position of the card")
+    description: str = Field("", description="The description of the drawn card")
+    divinatory_meaning: str = Field("", description="The divinatory meaning of the drawn card")
+    reversed_meaning: str = Field("", description="The reversed divinatory meaning of the drawn card")
+    physical_description: str = Field("", description="The physical description of the drawn card")
+    interpretation: str = Field(..., description="The GPT interpretation of the card in its position")
+
+
+class ReadingSnapshot(BaseModel):
+    reading_id: str = Field(..., description="The shareable ID of the reading")
+    deck_hash: str = Field(..., description="The content hash of the deck the reading was drawn from")
+    deck_source: Optional[str] = Field(None, description="Where the deck was loaded from, e.g. its Gist URL")
+    seed: int = Field(..., description="The RNG seed used to shuffle and draw")
+    querent_card_id: Optional[int] = Field(None, description="The card ID representing the querent")
+    question: str = Field(..., description="The querent's question")
+    cards: List[SnapshotCard] = Field(..., description="The drawn cards in spread order")
+    spread_image_base64: str = Field(..., description="The rendered Keltic Cross spread as a base64 encoded image")
+    summary: str = Field(..., description="The final summary of the reading")
+    created_at: float = Field(default_factory=time.time, description="Unix time the reading was stored")
+
+
+def new_reading_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+class SnapshotStore:
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.environ.get("TAROTGPT_READINGS_DIR", "readings")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, reading_id: str) -> str:
+        # Reading IDs come from URLs, never let them escape the store directory
+        if not re.fullmatch(r"[0-9a-f]{6,64}", reading_id):
+            raise ValueError(f"Invalid reading ID: {reading_id}")
+        return os.path.join(self.directory, f"{reading_id}.json")
+
+    def save(self, snapshot: ReadingSnapshot):
+        path = self._path(snapshot.reading_id)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(snapshot.json())
+        os.replace(tmp_path, path)
+
+    def load(self, reading_id: str) -> Optional[ReadingSnapshot]:
+        try:
+            path = self._path(reading_id)
+        except ValueError:
+            return None
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return ReadingSnapshot(**json.load(f))
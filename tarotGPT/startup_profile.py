@@ -0,0 +1,77 @@
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+
+# Startup profiling for the Streamlit pages, enabled with TAROTGPT_PROFILE_STARTUP=1.
+#
+# For every script run it records the time spent in the page's top-level imports and until the page
+# finished rendering, flags the first run of each page in this process, and reports how long heavy
+# dependencies loaded through lazy_import() took the first time a code path needed them.
+# Reports are printed as JSON lines (and shown in the sidebar) so cold starts can be compared.
+
+PROFILE_ENABLED = os.environ.get("TAROTGPT_PROFILE_STARTUP") == "1"
+
+_lock = threading.Lock()
+_import_seconds = {}
+_pages_seen = set()
+
+
+# Seconds since this process started, read from /proc where available
+def process_uptime():
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            system_uptime = float(f.read().split()[0])
+        return system_uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# Import a heavy dependency on first use, recording how long the first import took
+def lazy_import(name: str):
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    with _lock:
+        _import_seconds.setdefault(name, time.perf_counter() - started)
+    return module
+
+
+class PageProfile:
+    def __init__(self, page: str):
+        self.page = page
+        self.started = time.perf_counter()
+        self.imports_seconds = None
+        with _lock:
+            self.first_run = page not in _pages_seen
+            _pages_seen.add(page)
+
+    def imports_done(self):
+        self.imports_seconds = time.perf_counter() - self.started
+
+    def rendered(self):
+        if not PROFILE_ENABLED:
+            return
+        report = {
+            "page": self.page,
+            "first_run_in_process": self.first_run,
+            "imports_seconds": round(self.imports_seconds or 0.0, 4),
+            "render_seconds": round(time.perf_counter() - self.started, 4),
+            "process_uptime_seconds": process_uptime(),
+            "lazy_imports_seconds": {name: round(seconds, 4) for name, seconds in _import_seconds.items()},
+        }
+        print(json.dumps({"startup_profile": report}), flush=True)
+
+        import streamlit as st
+        with st.sidebar.expander("Startup profile", expanded=False):
+            st.json(report)
+
+
+def page_profile(page: str) -> PageProfile:
+    return PageProfile(page)
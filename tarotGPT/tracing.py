@@ -0,0 +1,281 @@
+import atexit
+import contextvars
+import functools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+# Lightweight tracing layer shared by the Streamlit pages and the Flux model container.
+#
+# Finished spans are queued and handed to the configured exporters in batches by a background thread,
+# so a slow exporter never delays the traced code:
+#   TAROTGPT_TRACE_JSONL=<path>  append one JSON object per span ("-" writes to stdout)
+#   TAROTGPT_OTLP_ENDPOINT=<url> POST spans to an OTLP/HTTP JSON collector, e.g. http://localhost:4318/v1/traces
+# Independently of the exporters, spans are appended to the list bound with bind_session()
+# so the Streamlit debug panel can show the waterfall of the current session.
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    end: Optional[float] = None
+    attributes: Dict[str, object] = field(default_factory=dict)
+    status: str = "ok"
+
+    @property
+    def duration(self) -> float:
+        if self.end is None:
+            return 0.0
+        return self.end - self.start
+
+    def to_dict(self):
+        record = asdict(self)
+        record["duration"] = self.duration
+        return record
+
+
+class JsonLinesExporter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        with self._lock:
+            if self.path == "-":
+                sys.stdout.write(lines)
+                sys.stdout.flush()
+            else:
+                with open(self.path, "a") as f:
+                    f.write(lines)
+
+
+class OTLPHttpExporter:
+    def __init__(self, endpoint: str, service_name: str = "tarotGPT", timeout: float = 2.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    # Encode a span in the OTLP/HTTP JSON format accepted by the OpenTelemetry collector
+    def _encode_span(self, span: Span):
+        attributes = [
+            {"key": key, "value": {"stringValue": str(value)}} for key, value in span.attributes.items()
+        ]
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "startTimeUnixNano": str(int(span.start * 1e9)),
+            "endTimeUnixNano": str(int((span.end or span.start) * 1e9)),
+            "attributes": attributes,
+            "status": {"code": 1 if span.status == "ok" else 2},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        return otlp_span
+
+    def _encode(self, spans: List[Span]):
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{"scope": {"name": "tarotGPT.tracing"}, "spans": [self._encode_span(span) for span in spans]}],
+            }]
+        }
+
+    def export(self, spans: List[Span]):
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(self._encode(spans)).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except OSError:
+            # A missing local collector must never break a reading or a deck generation
+            pass
+
+
+class SpanStats:
+    # Count, total and maximum duration per span name, e.g. to compare pipeline and encode time of a container
+    def __init__(self):
+        self._stats: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, span: Span):
+        with self._lock:
+            stats = self._stats.setdefault(span.name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += span.duration
+            stats[2] = max(stats[2], span.duration)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                name: {"count": count, "total_seconds": total, "mean_seconds": total / count, "max_seconds": longest}
+                for name, (count, total, longest) in self._stats.items()
+            }
+
+
+class Tracer:
+    # Like OpenTelemetry's BatchSpanProcessor: spans wait in a bounded queue (dropped when it is full) and are
+    # exported every flush_interval seconds or once max_batch spans are waiting
+    def __init__(self, exporters=None, enabled: bool = True, flush_interval: float = 1.0, max_batch: int = 256,
+                 max_queue: int = 4096):
+        self.exporters = list(exporters or [])
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.span_stats = SpanStats()
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._export_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    def _finish(self, span: Span):
+        session_spans = _session_spans.get()
+        if session_spans is not None:
+            session_spans.append(span)
+        self.span_stats.record(span)
+        if not self.exporters:
+            return
+        self._start_worker()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+        if self._queue.qsize() >= self.max_batch:
+            self._wake.set()
+
+    def _start_worker(self):
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="tarotgpt-span-export", daemon=True)
+                self._worker.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    # Export all queued spans now, in batches of at most max_batch; also called when the process exits
+    def flush(self):
+        with self._export_lock:
+            while True:
+                batch = []
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return
+                for exporter in self.exporters:
+                    try:
+                        exporter.export(batch)
+                    except Exception:
+                        # Exporting is best effort and must never take down the worker
+                        pass
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            yield None
+            return
+
+        parent = _current_span.get()
+        current = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            start=time.time(),
+            attributes=dict(attributes),
+        )
+        token = _current_span.set(current)
+        try:
+            yield current
+        except BaseException as e:
+            current.status = "error"
+            current.attributes["error"] = repr(e)
+            raise
+        finally:
+            current.end = time.time()
+            _current_span.reset(token)
+            self._finish(current)
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("tarotgpt_current_span", default=None)
+_session_spans: contextvars.ContextVar = contextvars.ContextVar("tarotgpt_session_spans", default=None)
+
+
+# Build the process-wide tracer from the environment
+def _tracer_from_env() -> Tracer:
+    tracer = Tracer(enabled=os.environ.get("TAROTGPT_TRACE", "1") != "0")
+    jsonl_path = os.environ.get("TAROTGPT_TRACE_JSONL")
+    if jsonl_path:
+        tracer.add_exporter(JsonLinesExporter(jsonl_path))
+    otlp_endpoint = os.environ.get("TAROTGPT_OTLP_ENDPOINT")
+    if otlp_endpoint:
+        tracer.add_exporter(OTLPHttpExporter(otlp_endpoint))
+    return tracer
+
+
+_tracer = _tracer_from_env()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+# Context manager recording a span on the global tracer
+def span(name: str, **attributes):
+    return _tracer.span(name, **attributes)
+
+
+# Decorator recording a span around every call of the wrapped function
+def traced(name: Optional[str] = None):
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Collect finished spans of the current script run into the given list (e.g. one kept in st.session_state)
+def bind_session(spans: List[Span], max_spans: int = 500):
+    if len(spans) > max_spans:
+        del spans[:len(spans) - max_spans]
+    _session_spans.set(spans)
+
+
+# Submit fn to an executor in a copy of the caller's context, so its spans join the caller's trace
+# and the session waterfall
+def submit_in_context(executor, fn, *args, **kwargs):
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args, **kwargs)
@@ -0,0 +1,45 @@
+import base64
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tarotGPT import imaging  # noqa: E402
+
+
+# A fresh CPU stand-in per test, started with the given warm-up tiers
+@pytest.fixture
+def standin(monkeypatch):
+    def start(warm_up_tiers=""):
+        monkeypatch.setenv("TAROTGPT_WARM_UP_TIERS", warm_up_tiers)
+        monkeypatch.setattr(imaging, "_standin_pipeline", None)
+        monkeypatch.setattr(imaging, "_standin_embedding_cache", None)
+        monkeypatch.setattr(imaging, "_standin_startup", None)
+        return imaging
+    return start
+
+
+# A small imaged deck with stand-in images: three major and three minor arcana
+@pytest.fixture
+def small_deck():
+    from tarotGPT.models import ImagedArcana, ImagedTarotDeck
+    from tarotGPT.renditions import make_renditions
+
+    def card(name):
+        image = imaging.standin_inference(f"test {name}", tier="final")
+        return ImagedArcana(
+            name=name,
+            description=f"{name} description",
+            divinatory_meaning=f"{name} meaning",
+            reversed=f"{name} reversed",
+            physical_description=f"{name} physical description",
+            image_base64=base64.b64encode(image).decode("utf-8"),
+            renditions=make_renditions(image),
+        )
+
+    return ImagedTarotDeck(
+        major_arcana=[card(name) for name in ("The Fool", "The Magician", "The High Priestess")],
+        minor_arcana=[card(name) for name in ("Ace of Cups", "Two of Cups", "Queen of Swords")],
+    )
@@ -0,0 +1,72 @@
+import os
+import time
+
+from tarotGPT.artifacts import ArtifactStore, artifact_key
+
+
+def backdate(path, accessed_ago=0.0, created_ago=0.0):
+    now = time.time()
+    os.utime(path, (now - accessed_ago, now - created_ago))
+
+
+def test_artifact_key_covers_every_input():
+    key = artifact_key("cards_pdf", "deck", "cardback", dpi=300)
+
+    assert key == artifact_key("cards_pdf", "deck", "cardback", dpi=300)
+    assert len({
+        key,
+        artifact_key("major_grid", "deck", "cardback", dpi=300),
+        artifact_key("cards_pdf", "edited deck", "cardback", dpi=300),
+        artifact_key("cards_pdf", "deck", None, dpi=300),
+        artifact_key("cards_pdf", "deck", "cardback", dpi=150),
+    }) == 5
+
+
+def test_get_or_create_builds_once(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=1024, ttl_seconds=60)
+    builds = []
+
+    first = store.get_or_create("a" * 64, "png", lambda: builds.append(1) or b"grid")
+    second = store.get_or_create("a" * 64, "png", lambda: builds.append(1) or b"grid")
+
+    assert first == second
+    assert builds == [1]
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["artifacts"]) == (1, 1, 1)
+
+
+def test_evicts_least_recently_used_over_the_size_cap(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=250, ttl_seconds=60)
+    old = store.put("a" * 64, "png", b"x" * 100)
+    used = store.put("b" * 64, "png", b"x" * 100)
+    backdate(old, accessed_ago=20)
+    backdate(used, accessed_ago=10)
+    assert store.get("b" * 64, "png") == used  # a hit makes it the most recently used
+
+    new = store.put("c" * 64, "png", b"x" * 100)
+
+    assert not os.path.exists(old)
+    assert os.path.exists(used) and os.path.exists(new)
+    assert store.stats()["evictions"] == 1
+
+
+def test_drops_expired_artifacts(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=1024, ttl_seconds=60)
+    expired = store.put("a" * 64, "pdf", b"old")
+    fresh = store.put("b" * 64, "pdf", b"new")
+    backdate(expired, created_ago=120)
+
+    assert store.get("a" * 64, "pdf") is None
+    assert store.get("b" * 64, "pdf") == fresh
+    assert not os.path.exists(expired)
+
+
+def test_expired_artifacts_are_evicted_on_put(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=1024, ttl_seconds=60)
+    expired = store.put("a" * 64, "pdf", b"old")
+    backdate(expired, created_ago=120)
+
+    store.put("b" * 64, "pdf", b"new")
+
+    assert not os.path.exists(expired)
+    assert store.stats()["artifacts"] == 1
@@ -0,0 +1,90 @@
+import io
+import json
+import os
+
+import pytest
+
+from tarotGPT import batch
+from tarotGPT.batch import BatchDeckGenerator, Progress, deck_slug
+from tarotGPT.models import Arcana, ImagedTarotDeck, TarotDeck
+
+
+def arcanas(prefix, count):
+    return [Arcana(name=f"{prefix} {idx}", description="d", divinatory_meaning="m", reversed="r") for idx in range(count)]
+
+
+class FakeSteps:
+    # Records the GPT and Flux calls of a batch run; cards named in failing_cards fail to render
+    def __init__(self, monkeypatch):
+        self.decks = []
+        self.described = []
+        self.rendered = []
+        self.failing_cards = set()
+        monkeypatch.setattr(batch, "generate_deck", self.generate_deck)
+        monkeypatch.setattr(batch, "generate_physical_descriptions", self.generate_physical_descriptions)
+        monkeypatch.setattr(batch, "generate_card_image", self.generate_card_image)
+
+    def generate_deck(self, client, theme, priority=None):
+        self.decks.append(theme)
+        return TarotDeck(major_arcana=arcanas("Major", 2), minor_arcana=arcanas("Minor", 2))
+
+    def generate_physical_descriptions(self, client, batch_arcana):
+        self.described.extend(arcana.name for arcana in batch_arcana)
+        return [f"{arcana.name} description" for arcana in batch_arcana]
+
+    def generate_card_image(self, description, tier="final", priority=None):
+        name = description[:-len(" description")]
+        if name in self.failing_cards:
+            raise RuntimeError(f"{name} failed")
+        self.rendered.append(name)
+        return "aW1hZ2U=", {}
+
+
+def generator(tmp_path):
+    return BatchDeckGenerator(output_dir=str(tmp_path), concurrency=2, client=object(), progress=Progress(io.StringIO()))
+
+
+def test_generates_a_deck(monkeypatch, tmp_path):
+    steps = FakeSteps(monkeypatch)
+
+    path = generator(tmp_path).generate("Oceanic Adventures")
+
+    with open(path) as f:
+        deck = ImagedTarotDeck(**json.load(f))
+    assert [card.name for card in deck.major_arcana + deck.minor_arcana] == ["Major 0", "Major 1", "Minor 0", "Minor 1"]
+    assert deck.minor_arcana[1].physical_description == "Minor 1 description"
+    assert steps.decks == ["Oceanic Adventures"]
+
+
+def test_interrupted_run_resumes_from_its_checkpoints(monkeypatch, tmp_path):
+    steps = FakeSteps(monkeypatch)
+    steps.failing_cards = {"Minor 0"}
+
+    interrupted = generator(tmp_path)
+    with pytest.raises(RuntimeError):
+        interrupted.generate("Oceanic Adventures")
+    interrupted.executor.shutdown(wait=True)  # cards still in flight finish and are checkpointed
+    work_dir = os.path.join(str(tmp_path), ".work", deck_slug("Oceanic Adventures"))
+    assert sorted(os.listdir(os.path.join(work_dir, "cards"))) == ["0.json", "1.json", "3.json"]
+
+    steps.failing_cards = set()
+    steps.rendered = []
+    path = generator(tmp_path).generate("Oceanic Adventures")
+
+    # Only the missing card is rendered again; the deck text and descriptions come from the checkpoints
+    assert steps.rendered == ["Minor 0"]
+    assert steps.decks == ["Oceanic Adventures"]
+    assert sorted(steps.described) == ["Major 0", "Major 1", "Minor 0", "Minor 1"]
+    assert os.path.exists(path)
+
+
+def test_finished_decks_are_not_generated_again(monkeypatch, tmp_path):
+    steps = FakeSteps(monkeypatch)
+    first = generator(tmp_path).generate("Oceanic Adventures")
+    steps.rendered = []
+
+    results = generator(tmp_path).generate_all(["Oceanic Adventures"])
+
+    assert results == {"Oceanic Adventures": first}
+    assert steps.rendered == []
+    assert steps.decks == ["Oceanic Adventures"]
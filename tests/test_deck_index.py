@@ -0,0 +1,56 @@
+import random
+
+from tarotGPT.deck_index import DeckIndex, parse_minor_name
+
+
+def test_parse_minor_name():
+    assert parse_minor_name("The Queen of Tides") == ("Queen", "Tides")
+    assert parse_minor_name("ace of Cups") == ("Ace", "Cups")
+    assert parse_minor_name("The Fool") == (None, None)
+
+
+def test_index_lookups(small_deck):
+    index = DeckIndex(small_deck)
+
+    assert len(index) == 6
+    assert index.id_of("Two of Cups") == 4
+    assert index.id_of("Unknown") is None
+    assert [index.is_major(card_id) for card_id in range(6)] == [True, True, True, False, False, False]
+    assert index.ids_by_suit == {"Cups": [3, 4], "Swords": [5]}
+    assert index.court_ids == [5]
+
+
+def test_draw_returns_distinct_cards_outside_the_exclusions(small_deck):
+    index = DeckIndex(small_deck)
+    rng = random.Random(0)
+
+    for _ in range(50):
+        drawn = index.draw(3, excluded_ids=[0, 4], rng=rng)
+        card_ids = [card_id for card_id, _ in drawn]
+        assert len(set(card_ids)) == 3
+        assert set(card_ids) <= {1, 2, 3, 5}
+        assert all(isinstance(reversed_, bool) for _, reversed_ in drawn)
+
+
+def test_draw_is_capped_by_the_available_cards(small_deck):
+    index = DeckIndex(small_deck)
+
+    drawn = index.draw(10, excluded_ids=range(4), rng=random.Random(1))
+
+    assert sorted(card_id for card_id, _ in drawn) == [4, 5]
+    assert index.draw(1, excluded_ids=range(6)) == []
+
+
+def test_draw_is_reproducible_with_a_seeded_rng(small_deck):
+    index = DeckIndex(small_deck)
+
+    assert index.draw(4, rng=random.Random(7)) == index.draw(4, rng=random.Random(7))
+
+
+def test_images_are_loaded_once_per_card(small_deck):
+    loaded = []
+    index = DeckIndex(small_deck, content_hash="stored", image_loader=lambda card_id: loaded.append(card_id) or card_id)
+
+    assert index.imaged_card(2) == index.imaged_card(2) == 2
+    assert loaded == [2]
+    assert index.content_hash == "stored"
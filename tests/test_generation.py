@@ -0,0 +1,120 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from tarotGPT import generation, image_backends
+from tarotGPT.image_backends import ImageRouter, StandInBackend
+from tarotGPT.models import Arcana, PhysicalDescription, PhysicalDescriptionBatch
+
+
+class RecordingBackend(StandInBackend):
+    # Stand-in backend recording when each render of each tier ran
+    def __init__(self):
+        self.renders = []
+        self._lock = threading.Lock()
+
+    def infer(self, prompt, tier="final", n_steps=None, seed=None, **kwargs):
+        started = time.monotonic()
+        result = super().infer(prompt, tier=tier, n_steps=n_steps, seed=seed, **kwargs)
+        with self._lock:
+            self.renders.append((tier, started, time.monotonic()))
+        return result
+
+
+def arcanas(count):
+    return [Arcana(name=f"Card {idx}", description="d", divinatory_meaning="m", reversed="r") for idx in range(count)]
+
+
+@pytest.fixture
+def per_card_descriptions(monkeypatch):
+    described = []
+
+    def describe(client, arcana):
+        described.append(arcana.name)
+        return f"{arcana.name} on its own"
+
+    monkeypatch.setattr(generation, "generate_physical_description", describe)
+    return described
+
+
+def answer_batch(monkeypatch, answer):
+    def parse(client, **kwargs):
+        if isinstance(answer, Exception):
+            raise answer
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(parsed=answer))])
+
+    monkeypatch.setattr(generation, "parse_chat_completion", parse)
+
+
+@pytest.fixture
+def recording_router(monkeypatch, standin):
+    standin()
+    backend = RecordingBackend()
+    monkeypatch.setattr(image_backends, "_router", ImageRouter([backend]))
+    return backend
+
+
+def test_all_previews_render_before_the_first_final(monkeypatch, recording_router):
+    monkeypatch.setattr(
+        generation, "generate_physical_descriptions",
+        lambda client, batch: [f"{arcana.name} at generation test" for arcana in batch],
+    )
+    cards = arcanas(12)
+
+    events = list(generation.generate_card_images(None, cards, [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10, 11]]))
+
+    stages = [stage for stage, _, _, error in events if error is None]
+    assert stages.count("description") == stages.count("preview") == stages.count("final") == 12
+    first_final = stages.index("final")
+    assert "preview" not in stages[first_final:]
+
+    preview_ends = [ended for tier, _, ended in recording_router.renders if tier == "preview"]
+    final_starts = [started for tier, started, _ in recording_router.renders if tier == "final"]
+    assert max(preview_ends) <= min(final_starts)
+
+
+def test_failed_description_batch_skips_its_cards(monkeypatch, recording_router):
+    def describe(client, batch):
+        if batch[0].name == "Card 0":
+            raise RuntimeError("no descriptions")
+        return [arcana.name for arcana in batch]
+
+    monkeypatch.setattr(generation, "generate_physical_descriptions", describe)
+
+    events = list(generation.generate_card_images(None, arcanas(4), [[0, 1], [2, 3]]))
+
+    failed = sorted(idx for stage, idx, _, error in events if error is not None)
+    finals = sorted(idx for stage, idx, _, error in events if stage == "final" and error is None)
+    assert failed == [0, 1]
+    assert finals == [2, 3]
+
+
+def test_batched_descriptions_fall_back_per_missing_card(monkeypatch, per_card_descriptions):
+    answer_batch(monkeypatch, PhysicalDescriptionBatch(cards=[
+        PhysicalDescription(name="card 0", physical_description="A lantern"),
+        PhysicalDescription(name="Card 2", physical_description="word " * 61),
+    ]))
+
+    descriptions = generation.generate_physical_descriptions(None, arcanas(3))
+
+    assert descriptions == ["A lantern The card says Card 0 on the card.", "Card 1 on its own", "Card 2 on its own"]
+    assert per_card_descriptions == ["Card 1", "Card 2"]
+
+
+def test_unusable_batch_answer_falls_back_for_every_card(monkeypatch, per_card_descriptions):
+    class LengthFinishReasonError(Exception):
+        pass
+
+    answer_batch(monkeypatch, LengthFinishReasonError())
+
+    assert generation.generate_physical_descriptions(None, arcanas(2)) == ["Card 0 on its own", "Card 1 on its own"]
+
+
+def test_failed_batch_call_is_not_retried_per_card(monkeypatch, per_card_descriptions):
+    answer_batch(monkeypatch, RuntimeError("service unavailable"))
+
+    with pytest.raises(RuntimeError):
+        generation.generate_physical_descriptions(None, arcanas(2))
+    assert per_card_descriptions == []
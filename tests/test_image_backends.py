@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from tarotGPT.image_backends import ImageBackend, ImageRouter
+
+
+class FakeBackend(ImageBackend):
+    def __init__(self, name, delay=0.0, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.prompts = []
+
+    def infer(self, prompt, tier="final", n_steps=None, **kwargs):
+        self.prompts.append(prompt)
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} failed")
+        return self.name.encode()
+
+
+def test_fails_over_to_the_next_backend():
+    broken, healthy = FakeBackend("broken", fail=True), FakeBackend("healthy")
+    router = ImageRouter([broken, healthy])
+
+    assert router.infer("The Fool") == b"healthy"
+
+    stats = router.stats()
+    assert (stats["failovers"], stats["hedges"]) == (1, 0)
+    assert stats["backends"]["broken"]["errors"] == 1
+
+
+def test_raises_when_every_backend_fails():
+    router = ImageRouter([FakeBackend("a", fail=True), FakeBackend("b", fail=True)])
+
+    with pytest.raises(RuntimeError, match="a failed"):
+        router.infer("The Fool")
+
+
+def test_hedges_a_slow_primary():
+    slow, fast = FakeBackend("slow", delay=0.5), FakeBackend("fast")
+    router = ImageRouter([slow, fast], hedge_after=0.05)
+
+    assert router.infer("The Fool") == b"fast"
+
+    stats = router.stats()
+    assert (stats["hedges"], stats["hedge_wins"], stats["failovers"]) == (1, 1, 0)
+    assert slow.prompts == fast.prompts == ["The Fool"]
+
+
+def test_single_backend_is_never_hedged():
+    backend = FakeBackend("only", delay=0.1)
+    router = ImageRouter([backend], hedge_after=0.01)
+
+    assert router.infer("The Fool") == b"only"
+
+    assert router.stats()["hedges"] == 0
+    assert backend.prompts == ["The Fool"]
+
+
+def test_routes_to_the_fastest_backend_once_measured():
+    slow, fast = FakeBackend("slow", delay=0.02), FakeBackend("fast")
+    router = ImageRouter([slow, fast])
+    for backend in (slow, fast):
+        router._call(backend, "warm up")
+
+    assert router.ranked() == [fast, slow]
+    assert router.infer("The Fool") == b"fast"
+
+
+def test_repeatedly_failing_backend_goes_to_the_back():
+    flaky, healthy = FakeBackend("flaky", fail=True), FakeBackend("healthy", delay=0.01)
+    router = ImageRouter([flaky, healthy])
+    router._call(healthy, "warm up")
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            router._call(flaky, "warm up")
+
+    assert router.ranked() == [healthy, flaky]
+
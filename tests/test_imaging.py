@@ -0,0 +1,88 @@
+from io import BytesIO
+
+from PIL import Image
+
+from tarotGPT.imaging import PromptEmbeddingCache, TIERS, inference_key
+
+
+def test_embedding_cache_hits_repeated_prompts():
+    encoded = []
+    cache = PromptEmbeddingCache(lambda text: encoded.append(text) or (text, len(text)), max_entries=4)
+
+    assert cache.get("the fool") == ("the fool", 8)
+    assert cache.get("the fool") == ("the fool", 8)
+
+    assert encoded == ["the fool"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_embedding_cache_evicts_least_recently_used():
+    encoded = []
+    cache = PromptEmbeddingCache(lambda text: encoded.append(text) or text, max_entries=2)
+
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")  # "b" is now the least recently used
+    cache.get("c")
+    cache.get("a")
+    cache.get("b")
+
+    assert encoded == ["a", "b", "c", "b"]
+    assert cache.stats()["entries"] == 2
+
+
+def test_inference_key_differs_per_tier_and_seed():
+    preview = inference_key("The Fool", tier="preview")
+    final = inference_key("The Fool", tier="final")
+
+    assert preview != final
+    assert final == inference_key("The Fool")
+    assert inference_key("The Fool", seed=7) != final
+    assert inference_key("The Fool", seed=7) == inference_key("The Fool", seed=7)
+
+
+def test_standin_renders_tiers_and_reuses_prompt_embeddings(standin):
+    imaging = standin()
+
+    preview = Image.open(BytesIO(imaging.standin_inference("The Fool", tier="preview")))
+    final = Image.open(BytesIO(imaging.standin_inference("The Fool", tier="final")))
+
+    assert preview.size == (TIERS["preview"]["width"], TIERS["preview"]["height"])
+    assert final.size == (TIERS["final"]["width"], TIERS["final"]["height"])
+    # The final render of a previewed card reuses the preview's text-encoder output
+    stats = imaging.standin_stats()
+    assert stats["embedding_cache"]["hits"] == 1
+    assert stats["embedding_cache"]["misses"] == 1
+    assert stats["pipeline_calls"] == 2
+
+
+def test_standin_seed_gives_another_take(standin):
+    imaging = standin()
+
+    default = imaging.standin_inference("The Fool", tier="preview")
+
+    assert imaging.standin_inference("The Fool", tier="preview") == default
+    assert imaging.standin_inference("The Fool", tier="preview", seed=3) != default
+
+
+def test_standin_startup_phases_without_warm_up(standin):
+    imaging = standin()
+
+    imaging.standin_inference("The Fool", tier="preview")
+
+    phases = imaging.standin_stats()["startup"]["phases_seconds"]
+    assert list(phases) == ["weights_load", "device_transfer", "lora_load"]
+
+
+def test_standin_startup_warms_up_configured_tiers(standin):
+    imaging = standin(warm_up_tiers="preview,final")
+
+    imaging.standin_inference("The Fool", tier="preview")
+
+    stats = imaging.standin_stats()
+    assert list(stats["startup"]["phases_seconds"]) == [
+        "weights_load", "device_transfer", "lora_load", "warm_up_preview", "warm_up_final",
+    ]
+    # Two warm-up renders before the first request
+    assert stats["pipeline_calls"] == 3
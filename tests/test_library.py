@@ -0,0 +1,109 @@
+import base64
+
+import pytest
+
+from tarotGPT.deck_index import card_content_hash, deck_content_hash
+from tarotGPT.library import DeckLibrary, DuplicateDeckError
+from tarotGPT.models import ImagedArcana
+from tarotGPT.renditions import RENDITIONS
+
+
+@pytest.fixture
+def library(tmp_path):
+    return DeckLibrary(str(tmp_path / "deck_library"))
+
+
+def test_round_trip(library, small_deck):
+    deck_id = library.add_deck(small_deck, name="Test deck", theme="tests")
+
+    loaded = library.load_deck(deck_id, renditions=RENDITIONS)
+
+    assert loaded == small_deck
+    assert library.get_deck_info(deck_id)["content_hash"] == deck_content_hash(small_deck)
+    assert [deck["deck_id"] for deck in library.list_decks(theme="tests")] == [deck_id]
+
+
+def test_adding_the_same_deck_returns_its_id(library, small_deck):
+    assert library.add_deck(small_deck, name="Test deck") == library.add_deck(small_deck, name="Copy")
+
+
+def test_text_only_loads_and_per_card_queries(library, small_deck):
+    deck_id = library.add_deck(small_deck, name="Test deck")
+
+    text_only = library.load_deck(deck_id, with_images=False)
+    cups = library.load_cards(deck_id, suit="Cups", with_images=False)
+
+    assert [card.name for card in text_only.minor_arcana] == ["Ace of Cups", "Two of Cups", "Queen of Swords"]
+    assert all(card.image_base64 == "" for card in text_only.major_arcana + text_only.minor_arcana)
+    assert [card.name for card in cups] == ["Ace of Cups", "Two of Cups"]
+    assert library.card_hashes(deck_id) == [card_content_hash(card) for card in small_deck.major_arcana + small_deck.minor_arcana]
+
+
+def test_load_card_image_prefers_renditions(library, small_deck):
+    deck_id = library.add_deck(small_deck, name="Test deck")
+    card = small_deck.major_arcana[1]
+
+    thumbnail = library.load_card_image(deck_id, 1, *RENDITIONS["thumbnail"])
+
+    assert thumbnail == base64.b64decode(card.renditions["thumbnail"])
+    assert library.load_card_image(deck_id, 1) == base64.b64decode(card.image_base64)
+
+
+def edited_magician(small_deck):
+    replacement = small_deck.minor_arcana[0]
+    return ImagedArcana(
+        name="The Magician",
+        description="An edited description",
+        divinatory_meaning=replacement.divinatory_meaning,
+        reversed=replacement.reversed,
+        physical_description=replacement.physical_description,
+        image_base64=replacement.image_base64,
+        renditions=replacement.renditions,
+    )
+
+
+def test_replace_card_patches_one_card(library, small_deck):
+    deck_id = library.add_deck(small_deck, name="Test deck")
+    old_hashes = library.card_hashes(deck_id)
+    card = edited_magician(small_deck)
+
+    content_hash = library.replace_card(deck_id, 1, card)
+
+    loaded = library.load_deck(deck_id, renditions=RENDITIONS)
+    assert loaded.major_arcana[1] == card
+    assert loaded.major_arcana[0] == small_deck.major_arcana[0]
+    assert content_hash == deck_content_hash(loaded)
+    assert library.get_deck_info(deck_id)["content_hash"] == content_hash
+    new_hashes = library.card_hashes(deck_id)
+    assert [old == new for old, new in zip(old_hashes, new_hashes)] == [True, False, True, True, True, True]
+
+
+def test_replace_card_rejects_unknown_cards(library, small_deck):
+    deck_id = library.add_deck(small_deck, name="Test deck")
+
+    with pytest.raises(KeyError):
+        library.replace_card("missing", 0, small_deck.major_arcana[0])
+    with pytest.raises(IndexError):
+        library.replace_card(deck_id, 99, small_deck.major_arcana[0])
+
+
+def test_original_deck_can_be_added_again_after_an_edit(library, small_deck):
+    deck_id = library.add_deck(small_deck, name="Test deck")
+    library.replace_card(deck_id, 1, edited_magician(small_deck))
+
+    original_id = library.add_deck(small_deck, name="Original")
+
+    assert original_id not in (None, deck_id)
+    assert library.load_deck(original_id, renditions=RENDITIONS) == small_deck
+
+
+def test_replace_card_refuses_to_duplicate_another_deck(library, small_deck):
+    edited_id = library.add_deck(small_deck, name="Edited")
+    library.replace_card(edited_id, 1, edited_magician(small_deck))
+    deck_id = library.add_deck(small_deck, name="Test deck")
+
+    with pytest.raises(DuplicateDeckError) as error:
+        library.replace_card(deck_id, 1, edited_magician(small_deck))
+
+    assert error.value.deck_id == edited_id
+    assert library.load_deck(deck_id, renditions=RENDITIONS) == small_deck
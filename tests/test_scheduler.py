@@ -0,0 +1,134 @@
+import threading
+import time
+
+import pytest
+
+from tarotGPT.scheduler import AdaptiveScheduler, Priority, RateLimitedError, parse_reset
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def flaky(errors):
+    calls = []
+
+    def call():
+        calls.append(time.monotonic())
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+
+    return call, calls
+
+
+def scheduler(**kwargs):
+    return AdaptiveScheduler("test", requests_per_minute=6000, base_delay=0.01, max_delay=0.05, **kwargs)
+
+
+def test_parse_reset():
+    assert parse_reset("1s") == 1
+    assert parse_reset("6m0s") == 360
+    assert parse_reset("20ms") == pytest.approx(0.02)
+    assert parse_reset("2.5") == 2.5
+    assert parse_reset(None) is None
+
+
+def test_retries_transient_errors():
+    call, calls = flaky([StatusError(503), TimeoutError()])
+    test_scheduler = scheduler()
+
+    assert test_scheduler.run(call) == "ok"
+
+    assert len(calls) == 3
+    stats = test_scheduler.stats()
+    assert (stats["retries"], stats["failures"], stats["calls"]) == (2, 0, 1)
+
+
+def test_does_not_retry_client_errors():
+    call, calls = flaky([StatusError(400)])
+    test_scheduler = scheduler()
+
+    with pytest.raises(StatusError):
+        test_scheduler.run(call)
+
+    assert len(calls) == 1
+    assert test_scheduler.stats()["failures"] == 1
+
+
+def test_gives_up_after_max_retries():
+    call, calls = flaky([StatusError(500)] * 10)
+    test_scheduler = scheduler(max_retries=2)
+
+    with pytest.raises(StatusError):
+        test_scheduler.run(call)
+
+    assert len(calls) == 3
+
+
+def test_rate_limit_halves_concurrency():
+    call, _ = flaky([RateLimitedError()])
+    test_scheduler = scheduler(max_concurrency=8)
+
+    assert test_scheduler.run(call) == "ok"
+
+    stats = test_scheduler.stats()
+    assert stats["rate_limited"] == 1
+    assert 4 <= stats["concurrency_limit"] < 8
+
+
+def test_interactive_calls_run_before_waiting_bulk_calls():
+    test_scheduler = scheduler(max_concurrency=1)
+    release = threading.Event()
+    order = []
+
+    blocker = threading.Thread(target=test_scheduler.run, args=(release.wait,))
+    blocker.start()
+    while test_scheduler.stats()["in_flight"] == 0:
+        time.sleep(0.001)
+
+    def submit(name, priority):
+        thread = threading.Thread(target=test_scheduler.run, args=(order.append, name), kwargs={"priority": priority})
+        thread.start()
+        return thread
+
+    waiters = [submit("bulk", Priority.BULK)]
+    while test_scheduler.stats()["waiting"] < 1:
+        time.sleep(0.001)
+    waiters.append(submit("interactive", Priority.INTERACTIVE))
+    while test_scheduler.stats()["waiting"] < 2:
+        time.sleep(0.001)
+
+    release.set()
+    for thread in [blocker] + waiters:
+        thread.join(timeout=5)
+
+    assert order == ["interactive", "bulk"]
+
+
+def test_buckets_follow_reported_limits():
+    test_scheduler = AdaptiveScheduler("test", requests_per_minute=500, tokens_per_minute=30000)
+
+    test_scheduler.observe_headers({
+        "x-ratelimit-limit-requests": "5000",
+        "x-ratelimit-remaining-requests": "4999",
+        "x-ratelimit-limit-tokens": "2000000",
+        "x-ratelimit-remaining-tokens": "1990000",
+    })
+
+    stats = test_scheduler.stats()
+    assert (stats["requests_per_minute"], stats["tokens_per_minute"]) == (5000, 2000000)
+    assert test_scheduler.tokens.level == 1990000
+
+
+def test_configured_caps_limit_reported_limits():
+    test_scheduler = AdaptiveScheduler(
+        "test", requests_per_minute=500, tokens_per_minute=30000, max_tokens_per_minute=30000,
+    )
+
+    test_scheduler.observe_headers({"x-ratelimit-limit-tokens": "2000000", "x-ratelimit-remaining-tokens": "1990000"})
+
+    assert test_scheduler.tokens.capacity == 30000
+    assert test_scheduler.tokens.level == 30000
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+from tarotGPT.singleflight import SingleFlight
+
+
+def run_concurrently(flight, key, fn, count):
+    results = []
+    errors = []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    while flight.stats()["coalesced"] < count - 1:
+        time.sleep(0.001)
+    return threads, results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def render():
+        calls.append(1)
+        release.wait()
+        return b"image"
+
+    threads, results, errors = run_concurrently(flight, "The Fool", render, 4)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert (results, errors, calls) == ([b"image"] * 4, [], [1])
+    assert flight.stats() == {"executions": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_waiters_receive_the_leaders_exception():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def render():
+        release.wait()
+        raise RuntimeError("out of memory")
+
+    threads, results, errors = run_concurrently(flight, "The Fool", render, 3)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert results == []
+    assert [str(error) for error in errors] == ["out of memory"] * 3
+
+
+def test_calls_after_completion_and_other_keys_run_again():
+    flight = SingleFlight("test")
+
+    assert flight.do("The Fool", lambda: 1) == 1
+    assert flight.do("The Fool", lambda: 2) == 2
+    assert flight.do("The Magician", lambda: 3) == 3
+    with pytest.raises(ValueError):
+        flight.do("The Fool", int, "not a number")
+
+    assert flight.stats() == {"executions": 4, "coalesced": 0, "in_flight": 0}